@@ -1,23 +1,30 @@
 """The FordPass integration."""
 import asyncio
 import logging
-from datetime import timedelta
+import time
+from datetime import datetime, timedelta
 
-import async_timeout
 import voluptuous as vol
-from dotted.collection import DottedDict
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
     DataUpdateCoordinator,
     UpdateFailed,
 )
+from homeassistant.util import dt as dt_util, slugify
 
 from .const import CONF_PRESSURE_UNIT, CONF_DISTANCE_UNIT, DEFAULT_PRESSURE_UNIT, DEFAULT_DISTANCE_UNIT, DOMAIN, MANUFACTURER, REGION, VEHICLE, VIN
-from .fordpass_new import Vehicle
+from .capabilities import CapabilityProfile
+from .commands import CommandQueue
+from .decoder import decoderName
+from .fordpass_async import Account, ConnectionStats
+from .resilience import CircuitBreakers, RateLimiter, requestBudget
+from .snapshot import VehicleSnapshot
 
 CONFIG_SCHEMA = vol.Schema({DOMAIN: vol.Schema({})}, extra=vol.ALLOW_EXTRA)
 
@@ -27,10 +34,43 @@ _LOGGER = logging.getLogger(__name__)
 
 SCAN_INTERVAL = timedelta(seconds=300)
 
+# Polling speeds up while the car is running or charging and slows down while it sleeps
+ACTIVE_SCAN_INTERVAL = timedelta(seconds=60)
+CHARGING_SCAN_INTERVAL = timedelta(seconds=120)
+IDLE_SCAN_INTERVAL = timedelta(seconds=900)
+SLEEP_SCAN_INTERVAL = timedelta(seconds=1800)
+
+# A parked car counts as idle once it has reported nothing new for this long
+IDLE_AFTER = timedelta(hours=2)
+
+# Time allowed for the requests of a status or guard fetch, token renewal and
+# retries included, time spent waiting on the rate limiter is not counted
+STATUS_TIMEOUT = 30
+
+GUARD_TIMEOUT = 15
+
+ACCOUNTS = "accounts"
+
+# Entry id owning the account metrics sensor of each login
+ACCOUNT_SENSORS = "account_sensors"
+
+LIMITER = "limiter"
+
+# Setup time per platform added up over every vehicle
+STARTUP = "startup"
+
+STORAGE_VERSION = 1
+
+# Stored snapshots are written at most this often
+STORAGE_SAVE_DELAY = 60
+
+BREAKERS = "breakers"
+
 
 async def async_setup(hass: HomeAssistant, config: dict):
     """Set up the FordPass component."""
     hass.data.setdefault(DOMAIN, {})
+    _LOGGER.debug("Decoding API responses with %s", decoderName)
     return True
 
 
@@ -47,9 +87,14 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     else:
         _LOGGER.debug("CANT GET REGION")
         region = "North America & Canada"
-    coordinator = FordPassDataUpdateCoordinator(hass, user, password, vin, region, 1)
+    account = async_get_account(hass, user, password, region)
+    coordinator = FordPassDataUpdateCoordinator(hass, account, vin)
 
-    await coordinator.async_refresh()  # Get initial data
+    if await coordinator.async_restore():
+        # Entities start from the stored snapshot while the live status loads
+        hass.async_create_task(coordinator.async_refresh())
+    else:
+        await coordinator.async_refresh()  # Get initial data
 
     if not entry.options:
         await async_update_options(hass, entry)
@@ -61,19 +106,14 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
 
     for component in PLATFORMS:
         hass.async_create_task(
-            hass.config_entries.async_forward_entry_setup(entry, component)
+            async_forward_platform(hass, entry, coordinator, component)
         )
 
     async def async_refresh_status_service(service_call):
-        await hass.async_add_executor_job(
-            refresh_status, hass, service_call, coordinator
-        )
+        await refresh_status(hass, service_call, coordinator)
 
     async def async_clear_tokens_service(service_call):
-        await hass.async_add_executor_job(clear_tokens, hass, service_call, coordinator)
-
-    async def async_clear_tokens_service(service_call):
-        await hass.async_add_executor_job(clear_tokens, hass, service_call, coordinator)
+        await clear_tokens(hass, service_call, coordinator)
 
     hass.services.async_register(
         DOMAIN,
@@ -89,25 +129,79 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     return True
 
 
+def async_get_account(hass, user, password, region, endpoints=None):
+    """Return the Account shared by every config entry of the same login."""
+    accounts = hass.data[DOMAIN].setdefault(ACCOUNTS, {})
+    if user not in accounts:
+        stats = ConnectionStats()
+        session = async_create_clientsession(
+            hass, trace_configs=[stats.trace_config()]
+        )
+        configPath = hass.config.path(
+            f"custom_components/fordpass/fordpass_token_{slugify(user)}.txt"
+        )
+        # One limiter paces, and one set of circuit breakers guards, every account
+        accounts[user] = Account(
+            session,
+            user,
+            password,
+            region,
+            True,
+            configPath,
+            stats,
+            limiter=hass.data[DOMAIN].setdefault(LIMITER, RateLimiter()),
+            breakers=hass.data[DOMAIN].setdefault(BREAKERS, CircuitBreakers()),
+            endpoints=endpoints,
+        )
+    return accounts[user]
+
+
+@callback
+def async_add_platform_entities(platform, coordinator, entities, add):
+    """Register a platform's entities in one batch."""
+    coordinator.platform_entities[platform] = len(entities)
+    add(entities, False)
+
+
+async def async_forward_platform(hass, entry, coordinator, platform):
+    """Set up a platform for the entry and log how long registering took."""
+    started = time.perf_counter()
+    # Returns once the platform has added its entities, not just scheduled them
+    await hass.config_entries.async_forward_entry_setup(entry, platform)
+    elapsed = time.perf_counter() - started
+    totals = hass.data[DOMAIN].setdefault(STARTUP, {})
+    count, total = totals.get(platform, (0, 0.0))
+    totals[platform] = (count + 1, total + elapsed)
+    _LOGGER.debug(
+        "Set up %d %s entities for %s in %.1f ms, %.1f ms over %d vehicles",
+        coordinator.platform_entities.get(platform, 0),
+        platform,
+        coordinator.vin,
+        elapsed * 1000,
+        (total + elapsed) * 1000,
+        count + 1,
+    )
+
+
 async def async_update_options(hass, config_entry):
     options = {CONF_PRESSURE_UNIT: config_entry.data.get(CONF_PRESSURE_UNIT, DEFAULT_PRESSURE_UNIT)}
     options[CONF_DISTANCE_UNIT] = config_entry.data.get(CONF_DISTANCE_UNIT, DEFAULT_DISTANCE_UNIT)
     hass.config_entries.async_update_entry(config_entry, options=options)
 
 
-def refresh_status(hass, service, coordinator):
+async def refresh_status(hass, service, coordinator):
     _LOGGER.debug("Running Service")
     vin = service.data.get("vin", "")
-    status = coordinator.vehicle.requestUpdate(vin)
+    status = await coordinator.vehicle.requestUpdate(vin)
     if status == 401:
         _LOGGER.debug("Invalid VIN")
     elif status == 200:
         _LOGGER.debug("Refresh Sent")
 
 
-def clear_tokens(hass, service, coordinator):
+async def clear_tokens(hass, service, coordinator):
     _LOGGER.debug("Clearing Tokens")
-    coordinator.vehicle.clearToken()
+    await coordinator.vehicle.clearToken()
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
@@ -121,21 +215,67 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
         )
     )
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator.commands.cancel()
+        username = coordinator.account.username
+        owners = hass.data[DOMAIN].get(ACCOUNT_SENSORS, {})
+        if owners.get(username) == entry.entry_id:
+            owners.pop(username)
+        remaining = [
+            other
+            for other in hass.data[DOMAIN].values()
+            if getattr(other, "account", None) is coordinator.account
+        ]
+        # Drop the account once its last vehicle is gone
+        if not remaining:
+            hass.data[DOMAIN][ACCOUNTS].pop(username, None)
+            coordinator.account.close()
+            # The session was created for this account in async_get_account
+            await coordinator.account.session.close()
+        elif username not in owners:
+            # Hand the account sensor over to a vehicle still on the account
+            for other in remaining:
+                if other.add_account_sensor is not None:
+                    owners[username] = other.add_account_sensor()
+                    break
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Delete the stored snapshot of a removed vehicle."""
+    await Store(hass, STORAGE_VERSION, _storage_key(entry.data[VIN])).async_remove()
+
+
+def _storage_key(vin):
+    return f"{DOMAIN}.{vin}"
+
+
 class FordPassDataUpdateCoordinator(DataUpdateCoordinator):
     """DataUpdateCoordinator to handle fetching new data about the vehicle."""
 
-    def __init__(self, hass, user, password, vin, region, saveToken=False):
+    def __init__(self, hass, account, vin):
         """Initialize the coordinator and set up the Vehicle object."""
         self._hass = hass
         self.vin = vin
-        configPath = hass.config.path("custom_components/fordpass/fordpass_token.txt")
-        self.vehicle = Vehicle(user, password, vin, region, saveToken, configPath)
+        self.account = account
+        self.vehicle = account.vehicle(vin)
+        self.commands = CommandQueue(self.vehicle)
         self._available = True
+        self._guardstatus = {}
+        self._guard_fetched = False
+        self._last_refresh = None
+        self._last_change = dt_util.utcnow()
+        self._previous = None
+        self._store = Store(hass, STORAGE_VERSION, _storage_key(vin))
+        self.changed_keys = None
+        self.capabilities = None
+        # Set by the sensor platform, adds the account metrics sensor to this entry
+        self.add_account_sensor = None
+        # Entities each platform registered, for the setup log
+        self.platform_entities = {}
+        # True while the data is a stored snapshot not yet confirmed by a live refresh
+        self.stale = False
 
         super().__init__(
             hass,
@@ -146,23 +286,22 @@ class FordPassDataUpdateCoordinator(DataUpdateCoordinator):
 
     async def _async_update_data(self):
         """Fetch data from FordPass."""
+        # Unknown until this refresh succeeds, so a failure writes every entity
+        self.changed_keys = None
+        now = dt_util.utcnow()
+        probe = self.capabilities is None or self.capabilities.due(now)
+        guard = None
+        if probe or self.capabilities.guard:
+            # Guard status is fetched alongside the vehicle status and never fails
+            # the refresh, cars without guard mode only get it when re-probed
+            guard = self._hass.async_create_task(self._async_update_guard())
         try:
-            async with async_timeout.timeout(30):
-                data = await self._hass.async_add_executor_job(
-                    self.vehicle.status  # Fetch new status
-                )
-
-                data["guardstatus"] = await self._hass.async_add_executor_job(
-                    self.vehicle.guardStatus  # Fetch new status
-                )
-
-                # If data has now been fetched but was previously unavailable, log and reset
-                if not self._available:
-                    _LOGGER.info("Restored connection to FordPass for %s", self.vin)
-                    self._available = True
-
-                return DottedDict(data)
+            with requestBudget(STATUS_TIMEOUT):
+                # Once there is a snapshot, only fetch a status the car has not sent yet
+                data = await self.vehicle.status(changedOnly=self._previous is not None)
         except Exception as ex:
+            if guard is not None:
+                guard.cancel()
             self._available = False  # Mark as unavailable
             _LOGGER.warning(str(ex))
             _LOGGER.warning("Error communicating with FordPass for %s", self.vin)
@@ -170,6 +309,160 @@ class FordPassDataUpdateCoordinator(DataUpdateCoordinator):
                 f"Error communicating with FordPass for {self.vin}"
             ) from ex
 
+        guardstatus = await guard if guard is not None else self._guardstatus
+        if data is not None:
+            snapshot = VehicleSnapshot(data, guardstatus)
+        elif guardstatus != self._previous.guardstatus:
+            snapshot = self._previous.with_guardstatus(guardstatus)
+        else:
+            # Nothing new from the car, entities keep their state
+            snapshot = self._previous
+
+        # If data has now been fetched but was previously unavailable, log and reset
+        if not self._available:
+            _LOGGER.info("Restored connection to FordPass for %s", self.vin)
+            self._available = True
+
+        self._async_adjust_interval(snapshot)
+        # A failed guard fetch says nothing about support, probe again next time
+        probed = probe and self._guard_fetched
+        if probed:
+            self._async_update_capabilities(snapshot, now)
+        elif self.capabilities is None:
+            self.capabilities = CapabilityProfile.probe(snapshot)
+        if probed or snapshot is not self._previous:
+            self._store.async_delay_save(self._async_stored_data, STORAGE_SAVE_DELAY)
+        self._async_track_changes(snapshot)
+        self.stale = False
+
+        _LOGGER.debug(
+            "Connections for %s: %s, coalesced token refreshes: %d",
+            self.vin,
+            self.account.connectionStats.as_dict(),
+            self.account.coalescedRefreshes,
+        )
+        return snapshot
+
+    async def async_restore(self):
+        """Load the last stored snapshot as stale data, return True if there was one."""
+        try:
+            stored = await self._store.async_load()
+            snapshot = stored and VehicleSnapshot.from_dict(stored)
+        except Exception as ex:
+            _LOGGER.warning("Ignoring stored snapshot for %s: %s", self.vin, ex)
+            return False
+        if not snapshot:
+            return False
+        _LOGGER.debug(
+            "Restored snapshot for %s reported at %s", self.vin, snapshot.lastRefresh
+        )
+        self.data = self._previous = snapshot
+        if stored.get("capabilities"):
+            self.capabilities = CapabilityProfile.from_dict(stored["capabilities"])
+        else:
+            # Stored before capabilities were, probed properly on the first refresh
+            self.capabilities = CapabilityProfile.probe(snapshot)
+        self._guardstatus = snapshot.guardstatus
+        self._last_refresh = snapshot.lastRefresh
+        # The next status is only decoded if the car has reported since
+        self.vehicle.lastRefresh = snapshot.lastRefresh
+        self.stale = True
+        return True
+
+    def _async_update_capabilities(self, snapshot, now):
+        """Replace the capability profile with the one the snapshot shows."""
+        profile = CapabilityProfile.probe(snapshot, now)
+        if self.capabilities is not None:
+            changed = profile.differs(self.capabilities)
+            if changed:
+                _LOGGER.info(
+                    "Capabilities of %s changed: %s, reload to update entities",
+                    self.vin,
+                    ", ".join(sorted(changed)),
+                )
+        self.capabilities = profile
+
+    def _async_stored_data(self):
+        """Return the latest snapshot and capability profile for storage."""
+        return {
+            **self._previous.as_dict(),
+            "capabilities": self.capabilities.as_dict() if self.capabilities else None,
+        }
+
+    def _async_track_changes(self, snapshot):
+        """Record which status fields changed since the last good refresh."""
+        if self._previous is None or not self.last_update_success:
+            # Everything is new after startup or an outage
+            self.changed_keys = None
+        elif snapshot is self._previous:
+            self.changed_keys = set()
+        else:
+            self.changed_keys = snapshot.changed(self._previous)
+            _LOGGER.debug("Changed keys for %s: %s", self.vin, self.changed_keys)
+        self._previous = snapshot
+
+    def _async_adjust_interval(self, snapshot):
+        """Pick the next polling interval from the state the car just reported."""
+        now = dt_util.utcnow()
+        if snapshot.lastRefresh != self._last_refresh:
+            self._last_refresh = snapshot.lastRefresh
+            self._last_change = now
+
+        if _value(snapshot.ignitionStatus) not in (None, "Off") or _value(
+            snapshot.remoteStartStatus
+        ) == 1:
+            interval = ACTIVE_SCAN_INTERVAL
+        elif _charging(snapshot, now):
+            interval = CHARGING_SCAN_INTERVAL
+        elif _value(snapshot.deepSleepInProgress) is True:
+            interval = SLEEP_SCAN_INTERVAL
+        elif now - self._last_change >= IDLE_AFTER:
+            interval = IDLE_SCAN_INTERVAL
+        else:
+            interval = SCAN_INTERVAL
+
+        if interval != self.update_interval:
+            _LOGGER.debug("Polling %s every %s", self.vin, interval)
+            self.update_interval = interval
+
+    async def _async_update_guard(self):
+        """Fetch guard status, keeping the last known value if it fails."""
+        self._guard_fetched = False
+        try:
+            with requestBudget(GUARD_TIMEOUT):
+                self._guardstatus = await self.vehicle.guardStatus() or {}
+            self._guard_fetched = True
+        except Exception as ex:
+            _LOGGER.warning(
+                "Error fetching guard status for %s, keeping last known value: %s",
+                self.vin,
+                ex,
+            )
+        return self._guardstatus
+
+
+def _value(reading):
+    """Return the value of a status reading, if the car reported it."""
+    if reading is None:
+        return None
+    return reading.value
+
+
+def _charging(snapshot, now):
+    """Return True while now falls inside the car's scheduled charge window."""
+    if snapshot.elVehDTE is None:
+        return False
+    try:
+        start = datetime.strptime(
+            _value(snapshot.chargeStartTime), "%m-%d-%Y %H:%M:%S"
+        )
+        end = datetime.strptime(_value(snapshot.chargeEndTime), "%m-%d-%Y %H:%M:%S")
+    except (TypeError, ValueError):
+        return False
+    return (
+        start.replace(tzinfo=dt_util.UTC) <= now <= end.replace(tzinfo=dt_util.UTC)
+    )
+
 
 class FordPassEntity(CoordinatorEntity):
     """Defines a base FordPass entity."""
@@ -182,6 +475,42 @@ class FordPassEntity(CoordinatorEntity):
         self._device_id = device_id
         self._name = name
 
+    # Status keys this entity reads, None means it is written on every refresh
+    _status_keys = None
+
+    # Availability and staleness at the last state write, any change of either
+    # is always written
+    _written_available = None
+    _written_stale = None
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Write state only if availability, staleness or a read status key changed."""
+        available = self.coordinator.last_update_success
+        stale = self.coordinator.stale
+        changed = self.coordinator.changed_keys
+        if (
+            available != self._written_available
+            or stale != self._written_stale
+            or self._shown_changed(changed)
+        ):
+            self._written_available = available
+            self._written_stale = stale
+            super()._handle_coordinator_update()
+
+    def _shown_changed(self, changed):
+        """Return True if what the entity shows may differ after a refresh."""
+        return (
+            changed is None
+            or self._status_keys is None
+            or not changed.isdisjoint(self._status_keys)
+        )
+
+    @property
+    def device_state_attributes(self):
+        """Return whether the state is a stored snapshot not yet refreshed live."""
+        return {"stale": self.coordinator.stale}
+
     @property
     def name(self):
         """Return the name of the entity."""
@@ -0,0 +1,59 @@
+"""Features each vehicle supports, probed from its status and guard status."""
+from datetime import timedelta
+
+from homeassistant.util import dt
+
+# A vehicle's capabilities are probed again after this long
+PROBE_INTERVAL = timedelta(hours=24)
+
+CAPABILITIES = ("guard", "gps", "zoneLighting", "elVeh")
+
+
+class CapabilityProfile:
+    """Which optional endpoints and status sections a vehicle supports."""
+
+    __slots__ = CAPABILITIES + ("probed",)
+
+    def __init__(self, guard, gps, zoneLighting, elVeh, probed=None):
+        """Initialize from probed values, a probed time of None is due at once."""
+        self.guard = guard
+        self.gps = gps
+        self.zoneLighting = zoneLighting
+        self.elVeh = elVeh
+        self.probed = probed
+
+    @classmethod
+    def probe(cls, snapshot, probed=None):
+        """Build the profile a snapshot shows."""
+        return cls(
+            guard=snapshot.guardstatus.get("returnCode") == 200,
+            gps=snapshot.gps is not None,
+            zoneLighting=snapshot.zoneLighting is not None,
+            elVeh=snapshot.elVehDTE is not None,
+            probed=probed,
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a profile stored with as_dict."""
+        probed = data.get("probed")
+        return cls(
+            **{name: data[name] for name in CAPABILITIES},
+            probed=dt.parse_datetime(probed) if probed else None,
+        )
+
+    def as_dict(self):
+        """Return the profile as JSON-serializable data for storage."""
+        data = {name: getattr(self, name) for name in CAPABILITIES}
+        data["probed"] = self.probed.isoformat() if self.probed else None
+        return data
+
+    def due(self, now):
+        """Return True if the profile should be probed again."""
+        return self.probed is None or now - self.probed >= PROBE_INTERVAL
+
+    def differs(self, other):
+        """Return the names of the capabilities that differ from another profile."""
+        return {
+            name for name in CAPABILITIES if getattr(self, name) != getattr(other, name)
+        }
@@ -0,0 +1,139 @@
+"""Record sanitized FordPass traffic to cassettes and replay it offline."""
+import asyncio
+import gzip
+import json
+import re
+import time
+from urllib.parse import urlsplit
+
+# Anything shaped like a VIN is replaced so cassettes hold no vehicle identity
+VIN_PATTERN = re.compile(r"\b[A-HJ-NPR-Z0-9]{17}\b")
+VIN_PLACEHOLDER = "{vin}"
+
+# Body fields replaced before anything is written to a cassette
+SECRET_FIELDS = ("access_token", "refresh_token", "code", "sessionId")
+GPS_FIELDS = ("latitude", "longitude")
+
+
+def _path(url):
+    """Return the URL path with the VIN replaced by a placeholder."""
+    return VIN_PATTERN.sub(VIN_PLACEHOLDER, urlsplit(url).path)
+
+
+def scrub(value):
+    """Return a copy of a decoded body with VINs, tokens and GPS removed."""
+    if isinstance(value, dict):
+        scrubbed = {}
+        for key, item in value.items():
+            if key in SECRET_FIELDS and item is not None:
+                scrubbed[key] = "REDACTED"
+            elif key in GPS_FIELDS and item is not None:
+                scrubbed[key] = "0.0"
+            else:
+                scrubbed[key] = scrub(item)
+        return scrubbed
+    if isinstance(value, list):
+        return [scrub(item) for item in value]
+    if isinstance(value, str):
+        return VIN_PATTERN.sub(VIN_PLACEHOLDER, value)
+    return value
+
+
+class Cassette:
+    """Sanitized request/response pairs in the order they were made."""
+
+    def __init__(self, interactions=None):
+        """Initialize with previously recorded interactions, if any."""
+        self.interactions = interactions or []
+
+    def add(self, method, url, params, status, body, elapsed):
+        """Record one exchange, scrubbing it on the way in."""
+        try:
+            payload = json.loads(body) if body.strip() else None
+        except ValueError:
+            payload = None
+        self.interactions.append(
+            {
+                "method": method,
+                "path": _path(url),
+                "params": scrub(params),
+                "status": status,
+                "body": scrub(payload),
+                "elapsed": round(elapsed, 4),
+            }
+        )
+
+    def save(self, location):
+        """Write the cassette as gzipped compact JSON."""
+        with gzip.open(location, "wt") as cassette:
+            json.dump(self.interactions, cassette, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, location):
+        """Read a cassette written by save."""
+        with gzip.open(location, "rt") as cassette:
+            return cls(json.load(cassette))
+
+
+class Recorder:
+    """Transport wrapper that records every exchange into a cassette."""
+
+    def __init__(self, transport, cassette):
+        """Wrap an Account transport."""
+        self.transport = transport
+        self.cassette = cassette
+
+    async def __call__(self, method, url, headers, data, params):
+        """Send the request and record its sanitized result."""
+        started = time.monotonic()
+        status, body = await self.transport(method, url, headers, data, params)
+        self.cassette.add(method, url, params, status, body, time.monotonic() - started)
+        return status, body
+
+
+class ReplayTransport:
+    """Transport serving a cassette back in recorded order for each request path.
+
+    Responses are delayed by their recorded latency divided by speed, a speed
+    of 0 replays without any delay.
+    """
+
+    def __init__(self, cassette, speed=1.0):
+        """Index the cassette by method and path."""
+        self.speed = speed
+        self._recorded = {}
+        self._positions = {}
+        for interaction in cassette.interactions:
+            key = (interaction["method"], interaction["path"])
+            self._recorded.setdefault(key, []).append(interaction)
+
+    async def __call__(self, method, url, headers, data, params):
+        """Return the next recorded response for this request path."""
+        key = (method, _path(url))
+        recorded = self._recorded.get(key)
+        if not recorded:
+            return 404, b'{"status": 404}'
+        position = self._positions.get(key, 0)
+        self._positions[key] = position + 1
+        interaction = recorded[position % len(recorded)]
+
+        if self.speed:
+            await asyncio.sleep(interaction["elapsed"] / self.speed)
+        body = json.dumps(interaction["body"])
+        vin = VIN_PATTERN.search(urlsplit(url).path)
+        if vin is not None:
+            body = body.replace(VIN_PLACEHOLDER, vin.group())
+        return interaction["status"], body.encode()
+
+
+def record(account, cassette=None):
+    """Start recording an Account's traffic and return the cassette."""
+    if cassette is None:
+        cassette = Cassette()
+    account.transport = Recorder(account.transport, cassette)
+    return cassette
+
+
+def replay(account, cassette, speed=1.0):
+    """Serve an Account's requests from a cassette instead of the network."""
+    account.transport = ReplayTransport(cassette, speed)
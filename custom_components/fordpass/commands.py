@@ -0,0 +1,118 @@
+"""Per-vehicle queue that runs remote commands one at a time."""
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# Commands in the same group undo each other, so only the latest queued one is sent
+COMMAND_GROUPS = {
+    "lock": "doors",
+    "unlock": "doors",
+    "start": "engine",
+    "stop": "engine",
+    "enableGuard": "guard",
+    "disableGuard": "guard",
+}
+
+
+class Superseded:
+    """Result of a queued command replaced by an opposite one before it was sent."""
+
+    def __init__(self, command, replacement):
+        """Initialize with the command dropped and the one sent instead."""
+        self.command = command
+        self.replacement = replacement
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return f"<Superseded {self.command} by {self.replacement}>"
+
+
+def log_result(action, vin, result):
+    """Log a command result that did not succeed, telling superseded ones apart."""
+    if isinstance(result, Superseded):
+        _LOGGER.info(
+            "%s %s was superseded by %s before it was sent",
+            action,
+            vin,
+            result.replacement,
+        )
+    elif not result:
+        _LOGGER.warning("%s %s did not succeed: %s", action, vin, result)
+
+
+class CommandQueue:
+    """Serialize a vehicle's commands and collapse ones superseded before dispatch."""
+
+    def __init__(self, vehicle):
+        """Initialize the queue for an AsyncVehicle."""
+        self.vehicle = vehicle
+        self.coalesced = 0
+        self._pending = {}
+        self._order = []
+        self._worker = None
+
+    async def submit(self, command):
+        """Queue a command and return its result, or Superseded if it was replaced.
+
+        A repeat of a queued command shares its result instead of being sent twice.
+        """
+        group = COMMAND_GROUPS.get(command, command)
+        future = asyncio.get_running_loop().create_future()
+        if group in self._pending:
+            superseded, waiters = self._pending[group]
+            if superseded != command:
+                _LOGGER.debug(
+                    "%s replaces queued %s for %s",
+                    command,
+                    superseded,
+                    self.vehicle.vin,
+                )
+                self.coalesced += 1
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(Superseded(superseded, command))
+                waiters = []
+            waiters.append(future)
+            self._pending[group] = (command, waiters)
+        else:
+            self._pending[group] = (command, [future])
+            self._order.append(group)
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+        return await future
+
+    async def _run(self):
+        """Send queued commands in order until the queue is empty."""
+        while self._order:
+            group = self._order.pop(0)
+            command, waiters = self._pending.pop(group)
+            _LOGGER.debug("Sending %s to %s", command, self.vehicle.vin)
+            try:
+                result = await getattr(self.vehicle, command)()
+            except asyncio.CancelledError:
+                for waiter in waiters:
+                    waiter.cancel()
+                raise
+            except Exception as ex:  # pylint: disable=broad-except
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(ex)
+            else:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(result)
+
+    def cancel(self):
+        """Stop the running command and drop everything still queued."""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        for command, waiters in self._pending.values():
+            for waiter in waiters:
+                waiter.cancel()
+        self._pending.clear()
+        self._order.clear()
@@ -5,6 +5,7 @@ import voluptuous as vol
 from homeassistant import config_entries, core, exceptions
 from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
 from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
 from .const import (  # pylint:disable=unused-import
     CONF_PRESSURE_UNIT,
@@ -18,7 +19,7 @@ from .const import (  # pylint:disable=unused-import
     REGION_OPTIONS,
     VIN,
 )
-from .fordpass_new import Vehicle
+from .fordpass_async import Account
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -38,13 +39,20 @@ async def validate_input(hass: core.HomeAssistant, data):
     Data has the keys from DATA_SCHEMA with values provided by the user.
     """
     _LOGGER.debug(data[REGION])
-    vehicle = Vehicle(data[CONF_USERNAME], data[CONF_PASSWORD], data[VIN], data[REGION])
+    account = Account(
+        async_get_clientsession(hass),
+        data[CONF_USERNAME],
+        data[CONF_PASSWORD],
+        data[REGION],
+    )
 
     try:
-        result = await hass.async_add_executor_job(vehicle.auth)
+        result = await account.auth()
 
     except Exception as ex:
         raise InvalidAuth from ex
+    finally:
+        account.close()
 
     if not result:
         _LOGGER.error("Failed to authenticate with fordpass")
@@ -27,14 +27,26 @@ SENSORS = {
     "fuel": {"icon": "mdi:gas-station"},
     "battery": {"icon": "mdi:car-battery"},
     "oil": {"icon": "mdi:oil"},
-    "tirePressure": {"icon": "mdi:car-tire-alert"},
+    "tirePressure": {"icon": "mdi:car-tire-alert", "keys": ("tirePressure", "TPMS")},
     "gps": {"icon": "mdi:radar"},
     "alarm": {"icon": "mdi:bell"},
     "ignitionStatus": {"icon": "hass:power"},
     "doorStatus": {"icon": "mdi:car-door"},
     "windowPosition": {"icon": "mdi:car-door"},
     "lastRefresh": {"icon": "mdi:clock"},
-    "elVeh": {"icon": "mdi:ev-station"},
+    "elVeh": {
+        "icon": "mdi:ev-station",
+        "keys": (
+            "elVehDTE",
+            "plugStatus",
+            "chargeStartTime",
+            "chargeEndTime",
+            "batteryFillLevel",
+            "chargerPowertype",
+            "batteryChargeStatus",
+            "batteryPerfStatus",
+        ),
+    },
     "deepSleepInProgress": {
         "icon": "mdi:power-sleep",
         "name": "Deep Sleep Mode Active",
@@ -43,11 +55,17 @@ SENSORS = {
         "icon": "mdi:one-up",
         "name": "Firmware Update In Progress",
     },
-    "remoteStartStatus": {"icon": "mdi:remote"},
+    "remoteStartStatus": {
+        "icon": "mdi:remote",
+        "keys": ("remoteStartStatus", "remoteStart"),
+    },
     "zoneLighting": {"icon": "mdi:spotlight-beam"},
 }
 
-SWITCHES = {"ignition": {"icon": "hass:power"}, "guardmode": {"icon": "mdi:shield-key"}}
+SWITCHES = {
+    "ignition": {"icon": "hass:power", "keys": ("remoteStartStatus",)},
+    "guardmode": {"icon": "mdi:shield-key", "keys": ("guardstatus",)},
+}
 
 WINDOW_POSITIONS = {
     "CLOSED": {
@@ -61,5 +79,3 @@ WINDOW_POSITIONS = {
         "Btwn 10% and 60% open": "Open-Partial",
     },
 }
-
-SWITCHES = {"ignition": {"icon": "hass:power"}, "guardmode": {"icon": "mdi:shield-key"}}
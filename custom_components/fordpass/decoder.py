@@ -0,0 +1,36 @@
+"""JSON decoding for API responses, using orjson when it is installed.
+
+Also scans a raw status body for its lastRefresh, so an unchanged status can
+skip decoding altogether.
+"""
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def stdlibLoads(body):
+    """Decode a bytes or str body with the standard library"""
+    return json.loads(body)
+
+
+if orjson is not None:
+    # orjson parses bytes directly and its errors subclass ValueError like json's
+    loads = orjson.loads
+    decoderName = "orjson"
+else:
+    loads = stdlibLoads
+    decoderName = "json"
+
+_lastRefreshPattern = re.compile(rb'"lastRefresh"\s*:\s*"([^"]*)"')
+
+
+def scanLastRefresh(body):
+    """Return the lastRefresh of a raw status body without decoding it, or None"""
+    match = _lastRefreshPattern.search(body)
+    if match is None:
+        return None
+    return match.group(1).decode()
@@ -4,7 +4,7 @@ from datetime import timedelta
 from homeassistant.components.device_tracker import SOURCE_TYPE_GPS
 from homeassistant.components.device_tracker.config_entry import TrackerEntity
 
-from . import FordPassEntity
+from . import FordPassEntity, async_add_platform_entities
 from .const import DOMAIN
 
 _LOGGER = logging.getLogger(__name__)
@@ -14,11 +14,13 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
     """Add the Entities from the config."""
     entry = hass.data[DOMAIN][config_entry.entry_id]
 
+    trackers = []
     # Added a check to see if the car supports GPS
-    if entry.data["gps"] != None:
-        async_add_entities([CarTracker(entry, "gps")], True)
+    if entry.capabilities.gps:
+        trackers.append(CarTracker(entry, "gps"))
     else:
         _LOGGER.debug("Vehicle does not support GPS")
+    async_add_platform_entities("device_tracker", entry, trackers, async_add_entities)
 
 
 class CarTracker(FordPassEntity, TrackerEntity):
@@ -28,14 +30,17 @@ class CarTracker(FordPassEntity, TrackerEntity):
         self.sensor = sensor
         self.coordinator = coordinator
         self._device_id = "fordpass_tracker"
+        self._status_keys = {sensor}
 
     @property
     def latitude(self):
-        return float(self.coordinator.data[self.sensor]["latitude"])
+        gps = self.coordinator.data.gps
+        return gps.latitude if gps is not None else None
 
     @property
     def longitude(self):
-        return float(self.coordinator.data[self.sensor]["longitude"])
+        gps = self.coordinator.data.gps
+        return gps.longitude if gps is not None else None
 
     @property
     def source_type(self):
@@ -51,7 +56,9 @@ class CarTracker(FordPassEntity, TrackerEntity):
 
     @property
     def device_state_attributes(self):
-        return self.coordinator.data[self.sensor].items()
+        section = getattr(self.coordinator.data, self.sensor)
+        attributes = section._asdict() if section is not None else {}
+        return {**attributes, **super().device_state_attributes}
 
     @property
     def icon(self):
@@ -0,0 +1,670 @@
+"""Asyncio FordPass client, one Account shared by all of its vehicles."""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+
+import aiohttp
+
+from .fordpass_new import (
+    TokenFile,
+    apiHeaders,
+    defaultEndpoints,
+    defaultHeaders,
+    epochRefresh,
+    region_lookup,
+)
+from .decoder import loads, scanLastRefresh
+from .metrics import ApiMetrics
+from .resilience import CircuitOpenError, backoffDelay, currentBudget, retryAttempts
+
+_LOGGER = logging.getLogger(__name__)
+
+# Renew the token this many seconds before it expires
+tokenRefreshMargin = 300
+
+# Wait this long before retrying a failed background refresh
+tokenRetryDelay = 60
+
+# Command polling starts at this interval, backs off by the factor up to the
+# maximum, and gives up once the deadline has passed
+commandPollInterval = 2
+commandPollBackoff = 1.5
+commandPollMaxInterval = 15
+commandDeadline = 120
+
+# Each attempt at a request may take this long. Retries are only made while
+# a whole attempt still fits in the budget of the operation, see requestBudget,
+# or of the request itself outside of one
+requestTimeout = 10
+requestRetryBudget = 25
+
+# Failures worth retrying, anything else is returned or raised straight away
+transientStatuses = (500, 502, 503, 504)
+transientErrors = (asyncio.TimeoutError, aiohttp.ClientConnectionError, ConnectionError)
+
+COMMAND_SUCCEEDED = "succeeded"
+COMMAND_FAILED = "failed"
+COMMAND_TIMED_OUT = "timed_out"
+
+
+class ConnectionStats(object):
+    # Counts new vs reused keep-alive connections for one account's session
+
+    def __init__(self):
+        self.new = 0
+        self.reused = 0
+
+    def trace_config(self):
+        """Return an aiohttp trace config feeding these counters"""
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(self.__onCreate)
+        trace.on_connection_reuseconn.append(self.__onReuse)
+        return trace
+
+    async def __onCreate(self, session, context, params):
+        self.new += 1
+
+    async def __onReuse(self, session, context, params):
+        self.reused += 1
+
+    def as_dict(self):
+        return {"new": self.new, "reused": self.reused}
+
+
+class FordPassError(Exception):
+    # Raised when the FordPass API answers with an error status
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Response(object):
+    # Status and raw body of a finished request, whichever transport sent it
+
+    def __init__(self, method, url, status, body, decode=loads):
+        self.method = method
+        self.url = url
+        self.status = status
+        self.body = body
+        self.decode = decode
+
+    def json(self):
+        """Return the decoded body, or None if it is empty or not JSON"""
+        try:
+            return self.decode(self.body) if self.body.strip() else None
+        except ValueError:
+            return None
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise FordPassError(
+                self.status, f"{self.method} {self.url} returned {self.status}"
+            )
+
+
+class CommandResult(object):
+    # Outcome of a remote command once polling has finished
+
+    def __init__(self, status, elapsed, commandId=None):
+        self.status = status
+        self.elapsed = elapsed
+        self.commandId = commandId
+
+    @property
+    def succeeded(self):
+        return self.status == COMMAND_SUCCEEDED
+
+    def __bool__(self):
+        return self.succeeded
+
+    def __repr__(self):
+        return f"<CommandResult {self.status} after {self.elapsed:.1f}s>"
+
+
+class Account(object):
+    # A FordPass login shared by every vehicle on it, owning the OAuth token and session
+
+    def __init__(
+        self,
+        session,
+        username,
+        password,
+        region,
+        saveToken=False,
+        configLocation="",
+        connectionStats=None,
+        refreshMargin=tokenRefreshMargin,
+        endpoints=None,
+        limiter=None,
+        breakers=None,
+        requestTimeout=requestTimeout,
+        retryBudget=requestRetryBudget,
+        decoder=loads,
+    ):
+        endpoints = {**defaultEndpoints, **(endpoints or {})}
+        self.ssoUrl = endpoints["sso"]
+        self.authUrl = endpoints["auth"]
+        self.baseUrl = endpoints["api"]
+        self.guardUrl = endpoints["guard"]
+        self.session = session
+        self.transport = self.sessionTransport
+        self.username = username
+        self.password = password
+        self.saveToken = saveToken
+        self.region = region_lookup[region]
+        self.connectionStats = connectionStats or ConnectionStats()
+        self.metrics = ApiMetrics()
+        self.limiter = limiter
+        self.breakers = breakers
+        self.requestTimeout = requestTimeout
+        self.retryBudget = retryBudget
+        self.decode = decoder
+        self.refreshMargin = refreshMargin
+        self.__refreshHandle = None
+        self.__refreshTask = None
+        self.__tokenFlight = None
+        self.coalescedRefreshes = 0
+        self.token = None
+        self.expiresAt = None
+        self.refresh_token = None
+        if configLocation == "":
+            self.token_location = "custom_components/fordpass/fordpass_token.txt"
+        else:
+            _LOGGER.debug(configLocation)
+            self.token_location = configLocation
+        self.tokenFile = TokenFile(self.token_location)
+
+    def vehicle(self, vin):
+        """Return a client for one of the account's vehicles"""
+        return AsyncVehicle(self, vin)
+
+    async def auth(self):
+        """Authenticate and store the token"""
+        return await self.__singleFlight(self.__auth)
+
+    async def refreshToken(self, token=None):
+        # Token is invalid so let's try refreshing it
+        return await self.__singleFlight(self.__refreshToken, token)
+
+    async def __singleFlight(self, method, *args):
+        # Concurrent callers share one token request instead of each hitting the SSO endpoint
+        if self.__tokenFlight is not None:
+            _LOGGER.debug("Token request already in progress, waiting for it")
+            self.coalescedRefreshes += 1
+            return await asyncio.shield(self.__tokenFlight)
+        # The flight carries the budget of the caller that started it, callers
+        # joining it are bounded by that budget as well as their own
+        flight = asyncio.ensure_future(method(*args))
+        flight.add_done_callback(self.__endFlight)
+        self.__tokenFlight = flight
+        # Shielded so a cancelled caller does not abort the request others wait on
+        return await asyncio.shield(flight)
+
+    def __endFlight(self, flight):
+        if self.__tokenFlight is flight:
+            self.__tokenFlight = None
+
+    async def __auth(self):
+        self.metrics.authentications += 1
+        data = {
+            "client_id": "9fb503e0-715b-47e8-adfd-ad4b7770f73b",
+            "grant_type": "password",
+            "username": self.username,
+            "password": self.password,
+        }
+
+        headers = {
+            **defaultHeaders,
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
+        # Fetch OAUTH token stage 1
+        r, result = await self.request(
+            "POST", self.ssoUrl, data, None, headers, retry=True
+        )
+
+        if r.status == 200:
+            _LOGGER.debug("Succesfully fetched token Stage1")
+            data = {"code": result["access_token"]}
+            headers = {**apiHeaders, "Application-Id": self.region}
+            # Fetch OAUTH token stage 2 and refresh token
+            r, result = await self.request(
+                "PUT",
+                f"{self.authUrl}/token",
+                json.dumps(data),
+                None,
+                headers,
+                retry=True,
+            )
+            if r.status == 200:
+                await self.__storeToken(result)
+                return True
+        else:
+            r.raise_for_status()
+
+    async def __refreshToken(self, token=None):
+        self.metrics.tokenRefreshes += 1
+        if token is None:
+            token = {"refresh_token": self.refresh_token}
+        data = {"refresh_token": token["refresh_token"]}
+        headers = {**apiHeaders, "Application-Id": self.region}
+
+        r, result = await self.request(
+            "PUT",
+            f"{self.authUrl}/refresh",
+            json.dumps(data),
+            None,
+            headers,
+            retry=True,
+        )
+        if r.status == 200:
+            await self.__storeToken(result)
+        if r.status == 401:
+            _LOGGER.debug("401 response stage 2: refresh stage 1 token")
+            await self.__auth()
+
+    async def __storeToken(self, result):
+        self.token = result["access_token"]
+        self.refresh_token = result["refresh_token"]
+        self.expiresAt = time.time() + result["expires_in"]
+        self.__scheduleRefresh()
+        if self.saveToken:
+            result["expiry_date"] = self.expiresAt
+            _LOGGER.debug(result)
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.tokenFile.write, result
+            )
+
+    def __loadToken(self, data):
+        self.token = data["access_token"]
+        self.refresh_token = data["refresh_token"]
+        self.expiresAt = data["expiry_date"]
+        self.__scheduleRefresh()
+
+    def __scheduleRefresh(self, delay=None):
+        # Renew the token in the background before it expires so polls never wait on it
+        if self.__refreshHandle is not None:
+            self.__refreshHandle.cancel()
+            self.__refreshHandle = None
+        if self.expiresAt is None:
+            return
+        if delay is None:
+            remaining = self.expiresAt - time.time()
+            delay = max(remaining - self.refreshMargin, remaining / 2, 0)
+        _LOGGER.debug("Scheduling token refresh in %d seconds", delay)
+        # Run in a fresh context, not the one of the operation that got the token,
+        # whose request budget will long have run out by the time it fires
+        self.__refreshHandle = asyncio.get_running_loop().call_later(
+            delay, self.__startRefresh, context=contextvars.Context()
+        )
+
+    def __startRefresh(self):
+        self.__refreshHandle = None
+        self.__refreshTask = asyncio.ensure_future(self.__backgroundRefresh())
+
+    async def __backgroundRefresh(self):
+        try:
+            await self.refreshToken()
+        except Exception as ex:
+            _LOGGER.warning("Background token refresh failed: %s", ex)
+            if not self.__expired():
+                self.__scheduleRefresh(tokenRetryDelay)
+        finally:
+            self.__refreshTask = None
+
+    def close(self):
+        """Stop the background token refresh"""
+        if self.__refreshHandle is not None:
+            self.__refreshHandle.cancel()
+            self.__refreshHandle = None
+        if self.__refreshTask is not None:
+            self.__refreshTask.cancel()
+            self.__refreshTask = None
+
+    def __expired(self):
+        return self.expiresAt is not None and time.time() >= self.expiresAt
+
+    async def acquireToken(self):
+        # Fetch and refresh token as needed
+        # The token in memory is the source of truth, the file is only consulted
+        # when it is missing or expired in case another process stored a newer one
+        if self.saveToken and (self.token is None or self.__expired()):
+            data = await asyncio.get_running_loop().run_in_executor(
+                None, self.tokenFile.read
+            )
+            if data is not None:
+                self.__loadToken(data)
+        if self.__expired():
+            _LOGGER.debug("No token, or has expired, requesting new token")
+            await self.refreshToken()
+        if self.token == None:
+            # No existing token exists so refreshing library
+            await self.auth()
+        else:
+            _LOGGER.debug("Token is valid, continuing")
+
+    async def clearToken(self):
+        def remove():
+            for location in ("/tmp/fordpass_token.txt", "/tmp/token.txt"):
+                if os.path.isfile(location):
+                    os.remove(location)
+            self.tokenFile.remove()
+
+        await asyncio.get_running_loop().run_in_executor(None, remove)
+        self.close()
+        self.token = None
+        self.refresh_token = None
+        self.expiresAt = None
+
+    async def request(
+        self,
+        method,
+        url,
+        data,
+        params,
+        headers=None,
+        metrics=None,
+        retry=None,
+        decode=True,
+    ):
+        """
+        Make a request to the given URL and return the response with its decoded body,
+        or None in its place without decode, recording it in the account's metrics
+        and in metrics if given.
+        Transient failures are retried with backoff when retry is set, which it is by
+        default for GET requests only, so remote commands are never sent twice
+        """
+        if retry is None:
+            retry = method == "GET"
+        breaker = self.breakers.breaker(url) if self.breakers is not None else None
+        budget = currentBudget(self.retryBudget)
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                waited = await self.limiter.acquire(self.username, url)
+                if waited:
+                    # Queueing for the limiter is not spent on the request itself
+                    budget.extend(waited)
+                    self.metrics.throttle(waited)
+                    if metrics is not None:
+                        metrics.throttle(waited)
+            remaining = budget.remaining()
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f"No time left to send {method} {url}")
+            if breaker is not None and not breaker.allow():
+                raise CircuitOpenError(breaker.host)
+            error = None
+            try:
+                status, body = await self.__send(
+                    method,
+                    url,
+                    data,
+                    params,
+                    headers,
+                    metrics,
+                    min(self.requestTimeout, remaining),
+                )
+            except transientErrors as ex:
+                error = ex
+                transient = True
+            else:
+                transient = status in transientStatuses
+            if breaker is not None:
+                if transient:
+                    breaker.failure()
+                else:
+                    breaker.success()
+            if not transient:
+                break
+
+            delay = backoffDelay(attempt)
+            if not retry or attempt >= retryAttempts or (
+                delay + self.requestTimeout > budget.remaining()
+            ):
+                if error is not None:
+                    raise error
+                break
+            attempt += 1
+            _LOGGER.debug(
+                "Transient failure from %s (%s), retry %d in %.1f seconds",
+                url,
+                error or status,
+                attempt,
+                delay,
+            )
+            self.metrics.retry(method, url)
+            if metrics is not None:
+                metrics.retry(method, url)
+            await asyncio.sleep(delay)
+
+        response = Response(method, url, status, body, self.decode)
+        if not decode:
+            return response, None
+        return response, response.json()
+
+    async def __send(self, method, url, data, params, headers, metrics, timeout):
+        if headers is None:
+            headers = {
+                **apiHeaders,
+                "auth-token": self.token,
+                "Application-Id": self.region,
+            }
+
+        started = time.monotonic()
+        try:
+            status, body = await asyncio.wait_for(
+                self.transport(method, url, headers, data, params), timeout
+            )
+        except Exception as ex:
+            self.__observe(method, url, type(ex).__name__, started, metrics)
+            raise
+        self.__observe(method, url, status, started, metrics)
+        return status, body
+
+    def __observe(self, method, url, status, started, metrics):
+        elapsed = time.monotonic() - started
+        self.metrics.observe(method, url, status, elapsed)
+        if metrics is not None:
+            metrics.observe(method, url, status, elapsed)
+
+    async def sessionTransport(self, method, url, headers, data, params):
+        """Send a request over the aiohttp session and return its status and raw body"""
+        async with self.session.request(
+            method, url, headers=headers, data=data, params=params
+        ) as r:
+            return r.status, await r.read()
+
+
+class AsyncVehicle(object):
+    # Asyncio counterpart of Vehicle, every request is awaited on the event loop
+
+    def __init__(
+        self,
+        account,
+        vin,
+        pollInterval=commandPollInterval,
+        pollBackoff=commandPollBackoff,
+        pollMaxInterval=commandPollMaxInterval,
+        deadline=commandDeadline,
+    ):
+        self.account = account
+        self.vin = vin
+        self.baseUrl = account.baseUrl
+        self.guardUrl = account.guardUrl
+        self.pollInterval = pollInterval
+        self.pollBackoff = pollBackoff
+        self.pollMaxInterval = pollMaxInterval
+        self.deadline = deadline
+        self.metrics = ApiMetrics()
+        self.lastRefresh = None
+
+    async def auth(self):
+        """Authenticate the vehicle's account"""
+        return await self.account.auth()
+
+    async def clearToken(self):
+        await self.account.clearToken()
+
+    async def status(self, changedOnly=False):
+        # Get the status of the vehicle
+        # With changedOnly, None is returned without decoding the body when the
+        # car has not reported since the last status
+
+        await self.account.acquireToken()
+
+        params = {"lrdt": self.lastRefresh or epochRefresh}
+
+        r, result = await self.__request(
+            "GET",
+            f"{self.baseUrl}/vehicles/v4/{self.vin}/status",
+            None,
+            params,
+            decode=False,
+        )
+        if r.status == 401:
+            _LOGGER.debug("401 with status request: start token refresh")
+            self.metrics.retry("GET", r.url)
+            await self.account.refreshToken()
+            await self.account.acquireToken()
+            r, result = await self.__request(
+                "GET",
+                f"{self.baseUrl}/vehicles/v4/{self.vin}/status",
+                None,
+                params,
+                decode=False,
+            )
+        r.raise_for_status()
+        if changedOnly and self.__unchanged(r):
+            _LOGGER.debug("No new status reported for %s", self.vin)
+            return None
+        result = r.json()
+        if result["status"] == 402:
+            raise FordPassError(402, f"GET {r.url} reported status 402")
+        self.lastRefresh = result["vehiclestatus"].get("lastRefresh")
+        return result["vehiclestatus"]
+
+    def __unchanged(self, r):
+        if self.lastRefresh is None:
+            return False
+        return r.status == 304 or scanLastRefresh(r.body) == self.lastRefresh
+
+    async def guardStatus(self):
+        # WIP current being tested
+        await self.account.acquireToken()
+
+        params = {"lrdt": "01-01-1970 00:00:00"}
+
+        r, result = await self.__request(
+            "GET", f"{self.guardUrl}/guardmode/v1/{self.vin}/session", None, params
+        )
+        return result
+
+    async def start(self):
+        """
+        Issue a start command to the engine
+        """
+        return await self.__requestAndPoll(
+            "PUT", f"{self.baseUrl}/vehicles/v2/{self.vin}/engine/start"
+        )
+
+    async def stop(self):
+        """
+        Issue a stop command to the engine
+        """
+        return await self.__requestAndPoll(
+            "DELETE", f"{self.baseUrl}/vehicles/v2/{self.vin}/engine/start"
+        )
+
+    async def lock(self):
+        """
+        Issue a lock command to the doors
+        """
+        return await self.__requestAndPoll(
+            "PUT", f"{self.baseUrl}/vehicles/v2/{self.vin}/doors/lock"
+        )
+
+    async def unlock(self):
+        """
+        Issue an unlock command to the doors
+        """
+        return await self.__requestAndPoll(
+            "DELETE", f"{self.baseUrl}/vehicles/v2/{self.vin}/doors/lock"
+        )
+
+    async def enableGuard(self):
+        """
+        Enable Guard mode on supported models
+        """
+        await self.account.acquireToken()
+
+        r, result = await self.__request(
+            "PUT", f"{self.guardUrl}/guardmode/v1/{self.vin}/session", None, None
+        )
+        _LOGGER.debug(result)
+        return result
+
+    async def disableGuard(self):
+        """
+        Disable Guard mode on supported models
+        """
+        await self.account.acquireToken()
+        r, result = await self.__request(
+            "DELETE", f"{self.guardUrl}/guardmode/v1/{self.vin}/session", None, None
+        )
+        _LOGGER.debug(result)
+        return result
+
+    async def requestUpdate(self, vin=""):
+        # Send request to refresh data from the cars module
+        await self.account.acquireToken()
+        if vin:
+            vinnum = vin
+        else:
+            vinnum = self.vin
+        r, result = await self.__request(
+            "PUT", f"{self.baseUrl}/vehicles/v2/{vinnum}/status", None, None
+        )
+        return result["status"]
+
+    async def __request(self, method, url, data, params, decode=True):
+        return await self.account.request(
+            method, url, data, params, metrics=self.metrics, decode=decode
+        )
+
+    async def __pollStatus(self, url, id, started):
+        """
+        Poll the given URL with the given command ID until the command is completed,
+        backing off between polls and giving up once the deadline has passed.
+        Cancelling the awaiting task stops polling.
+        """
+        delay = self.pollInterval
+        while True:
+            r, result = await self.__request("GET", f"{url}/{id}", None, None)
+            status = result["status"] if result else r.status
+            elapsed = time.monotonic() - started
+            if status == 200:
+                _LOGGER.debug("Command completed succesfully")
+                return CommandResult(COMMAND_SUCCEEDED, elapsed, id)
+            if status != 552:
+                _LOGGER.debug("Command failed with status %s", status)
+                return CommandResult(COMMAND_FAILED, elapsed, id)
+            remaining = self.deadline - elapsed
+            if remaining <= 0:
+                _LOGGER.debug("Command still pending after %d seconds", elapsed)
+                return CommandResult(COMMAND_TIMED_OUT, elapsed, id)
+            _LOGGER.debug("Command is pending")
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * self.pollBackoff, self.pollMaxInterval)
+
+    async def __requestAndPoll(self, method, url):
+        started = time.monotonic()
+        await self.account.acquireToken()
+        command, result = await self.__request(method, url, None, None)
+
+        if command.status == 200:
+            return await self.__pollStatus(url, result["commandId"], started)
+        command.raise_for_status()
+        return CommandResult(COMMAND_FAILED, time.monotonic() - started)
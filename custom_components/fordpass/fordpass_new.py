@@ -1,10 +1,14 @@
 import json
 import logging
 import os
+import threading
 import time
 
 import requests
 
+from .decoder import loads, scanLastRefresh
+from .metrics import ApiMetrics
+
 _LOGGER = logging.getLogger(__name__)
 defaultHeaders = {
     "Accept": "*/*",
@@ -28,18 +32,93 @@ baseUrl = "https://usapi.cv.ford.com/api"
 
 guardUrl = "https://api.mps.ford.com/api"
 
+ssoUrl = "https://sso.ci.ford.com/oidc/endpoint/default/token"
+
+authUrl = "https://api.mps.ford.com/api/oauth2/v1"
+
+# Base URL of each Ford service, replaceable to point a client at a stand-in server
+defaultEndpoints = {"sso": ssoUrl, "auth": authUrl, "api": baseUrl, "guard": guardUrl}
+
+# Sent as lrdt until a vehicle has reported its first lastRefresh
+epochRefresh = "01-01-1970 00:00:00"
+
+_sessions = {}
+_sessionsLock = threading.Lock()
+
+
+def sessionFor(username):
+    """Return the keep-alive session shared by every Vehicle of an account"""
+    with _sessionsLock:
+        session = _sessions.get(username)
+        if session is None:
+            session = requests.Session()
+            _sessions[username] = session
+        return session
+
+
+class TokenFile(object):
+    # Persists a token atomically and only re-reads it when the file changes on disk
+
+    def __init__(self, location):
+        self.location = location
+        self.mtime = None
+
+    def read(self):
+        """Return the stored token if the file changed since last seen, else None"""
+        try:
+            mtime = os.stat(self.location).st_mtime_ns
+        except FileNotFoundError:
+            self.mtime = None
+            return None
+        if mtime == self.mtime:
+            return None
+        self.mtime = mtime
+        try:
+            with open(self.location) as token_file:
+                return json.load(token_file)
+        except ValueError:
+            _LOGGER.debug("Ignoring malformed token file")
+            return None
+
+    def write(self, token):
+        """Replace the stored token in one step so readers never see a partial file"""
+        temp_location = f"{self.location}.tmp"
+        with open(temp_location, "w") as outfile:
+            json.dump(token, outfile)
+        os.replace(temp_location, self.location)
+        self.mtime = os.stat(self.location).st_mtime_ns
+
+    def remove(self):
+        if os.path.isfile(self.location):
+            os.remove(self.location)
+        self.mtime = None
+
 
 class Vehicle(object):
     # Represents a Ford vehicle, with methods for status and issuing commands
 
     def __init__(
-        self, username, password, vin, region, saveToken=False, configLocation=""
+        self,
+        username,
+        password,
+        vin,
+        region,
+        saveToken=False,
+        configLocation="",
+        endpoints=None,
+        decoder=loads,
     ):
+        endpoints = {**defaultEndpoints, **(endpoints or {})}
+        self.ssoUrl = endpoints["sso"]
+        self.authUrl = endpoints["auth"]
+        self.baseUrl = endpoints["api"]
+        self.guardUrl = endpoints["guard"]
         self.username = username
         self.password = password
         self.saveToken = saveToken
         self.region = region_lookup[region]
         self.vin = vin
+        self.session = sessionFor(username)
         self.token = None
         self.expires = None
         self.expiresAt = None
@@ -49,9 +128,16 @@ class Vehicle(object):
         else:
             _LOGGER.debug(configLocation)
             self.token_location = configLocation
+        self.tokenFile = TokenFile(self.token_location)
+        self.__tokenLock = threading.Lock()
+        self.coalescedRefreshes = 0
+        self.metrics = ApiMetrics()
+        self.lastRefresh = None
+        self.decode = decoder
 
     def auth(self):
         """Authenticate and store the token"""
+        self.metrics.authentications += 1
 
         data = {
             "client_id": "9fb503e0-715b-47e8-adfd-ad4b7770f73b",
@@ -65,8 +151,9 @@ class Vehicle(object):
             "Content-Type": "application/x-www-form-urlencoded",
         }
         # Fetch OAUTH token stage 1
-        r = requests.post(
-            "https://sso.ci.ford.com/oidc/endpoint/default/token",
+        r = self.__send(
+            "POST",
+            self.ssoUrl,
             data=data,
             headers=headers,
         )
@@ -77,8 +164,9 @@ class Vehicle(object):
             data = {"code": result["access_token"]}
             headers = {**apiHeaders, "Application-Id": self.region}
             # Fetch OAUTH token stage 2 and refresh token
-            r = requests.put(
-                "https://api.mps.ford.com/api/oauth2/v1/token",
+            r = self.__send(
+                "PUT",
+                f"{self.authUrl}/token",
                 data=json.dumps(data),
                 headers=headers,
             )
@@ -96,11 +184,13 @@ class Vehicle(object):
 
     def refreshToken(self, token):
         # Token is invalid so let's try refreshing it
+        self.metrics.tokenRefreshes += 1
         data = {"refresh_token": token["refresh_token"]}
         headers = {**apiHeaders, "Application-Id": self.region}
 
-        r = requests.put(
-            "https://api.mps.ford.com/api/oauth2/v1/refresh",
+        r = self.__send(
+            "PUT",
+            f"{self.authUrl}/refresh",
             data=json.dumps(data),
             headers=headers,
         )
@@ -118,68 +208,60 @@ class Vehicle(object):
 
     def __acquireToken(self):
         # Fetch and refresh token as needed
-        # If file exists read in token file and check it's valid
+        # The token in memory is used unless the saved token file changed on disk
         if self.saveToken:
-            if os.path.isfile(self.token_location):
-                data = self.readToken()
-            else:
-                data = dict()
-                data["access_token"] = self.token
-                data["refresh_token"] = self.refresh_token
-                data["expiry_date"] = self.expiresAt
-        else:
-            data = dict()
-            data["access_token"] = self.token
-            data["refresh_token"] = self.refresh_token
-            data["expiry_date"] = self.expiresAt
-        self.token = data["access_token"]
-        self.expiresAt = data["expiry_date"]
-        if self.expiresAt:
-            if time.time() >= self.expiresAt:
-                _LOGGER.debug("No token, or has expired, requesting new token")
-                self.refreshToken(data)
-                # self.auth()
-        if self.token == None:
-            # No existing token exists so refreshing library
-            self.auth()
-        else:
+            data = self.tokenFile.read()
+            if data is not None:
+                self.token = data["access_token"]
+                self.refresh_token = data["refresh_token"]
+                self.expiresAt = data["expiry_date"]
+        if self.token is not None and not (
+            self.expiresAt and time.time() >= self.expiresAt
+        ):
             _LOGGER.debug("Token is valid, continuing")
-            pass
+            return
+        seen = self.token
+        with self.__tokenLock:
+            if self.token is not seen:
+                # Another thread renewed the token while this one waited
+                self.coalescedRefreshes += 1
+                return
+            if self.expiresAt and time.time() >= self.expiresAt:
+                _LOGGER.debug("No token, or has expired, requesting new token")
+                self.refreshToken({"refresh_token": self.refresh_token})
+            if self.token == None:
+                # No existing token exists so refreshing library
+                self.auth()
 
     def writeToken(self, token):
         # Save token to file to be reused
-        with open(self.token_location, "w") as outfile:
-            token["expiry_date"] = time.time() + token["expires_in"]
-            _LOGGER.debug(token)
-            json.dump(token, outfile)
+        token["expiry_date"] = time.time() + token["expires_in"]
+        _LOGGER.debug(token)
+        self.tokenFile.write(token)
 
     def readToken(self):
         # Get saved token from file
-        try:
-            with open(self.token_location) as token_file:
-                token = json.load(token_file)
-                return token
-        except ValueError:
-            _LOGGER.debug("Fixing malformed token")
-            self.auth()
-            with open(self.token_location) as token_file:
-                token = json.load(token_file)
-                return token
+        self.tokenFile.mtime = None
+        return self.tokenFile.read()
 
     def clearToken(self):
         if os.path.isfile("/tmp/fordpass_token.txt"):
             os.remove("/tmp/fordpass_token.txt")
         if os.path.isfile("/tmp/token.txt"):
             os.remove("/tmp/token.txt")
-        if os.path.isfile(self.token_location):
-            os.remove(self.token_location)
+        self.tokenFile.remove()
+        self.token = None
+        self.refresh_token = None
+        self.expiresAt = None
 
-    def status(self):
+    def status(self, changedOnly=False):
         # Get the status of the vehicle
+        # With changedOnly, None is returned without decoding the body when the
+        # car has not reported since the last status
 
         self.__acquireToken()
 
-        params = {"lrdt": "01-01-1970 00:00:00"}
+        params = {"lrdt": self.lastRefresh or epochRefresh}
 
         headers = {
             **apiHeaders,
@@ -187,16 +269,15 @@ class Vehicle(object):
             "Application-Id": self.region,
         }
 
-        r = requests.get(
-            f"{baseUrl}/vehicles/v4/{self.vin}/status", params=params, headers=headers
+        r = self.__send(
+            "GET",
+            f"{self.baseUrl}/vehicles/v4/{self.vin}/status",
+            params=params,
+            headers=headers,
         )
-        if r.status_code == 200:
-            result = r.json()
-            if result["status"] == 402:
-                r.raise_for_status()
-            return result["vehiclestatus"]
         if r.status_code == 401:
             _LOGGER.debug("401 with status request: start token refresh")
+            self.metrics.retry("GET", r.url)
             data = dict()
             data["access_token"] = self.token
             data["refresh_token"] = self.refresh_token
@@ -208,16 +289,27 @@ class Vehicle(object):
                 "auth-token": self.token,
                 "Application-Id": self.region,
             }
-            r = requests.get(
-                f"{baseUrl}/vehicles/v4/{self.vin}/status",
+            r = self.__send(
+                "GET",
+                f"{self.baseUrl}/vehicles/v4/{self.vin}/status",
                 params=params,
                 headers=headers,
             )
-            if r.status_code == 200:
-                result = r.json()
-            return result["vehiclestatus"]
-        else:
+        if r.status_code != 200:
+            r.raise_for_status()
+        if changedOnly and self.__unchanged(r.content):
+            _LOGGER.debug("No new status reported for %s", self.vin)
+            return None
+        result = self.decode(r.content)
+        if result["status"] == 402:
             r.raise_for_status()
+        self.lastRefresh = result["vehiclestatus"].get("lastRefresh")
+        return result["vehiclestatus"]
+
+    def __unchanged(self, body):
+        return self.lastRefresh is not None and (
+            scanLastRefresh(body) == self.lastRefresh
+        )
 
     def guardStatus(self):
         # WIP current being tested
@@ -231,19 +323,20 @@ class Vehicle(object):
             "Application-Id": self.region,
         }
 
-        r = requests.get(
-            f"{guardUrl}/guardmode/v1/{self.vin}/session",
+        r = self.__send(
+            "GET",
+            f"{self.guardUrl}/guardmode/v1/{self.vin}/session",
             params=params,
             headers=headers,
         )
-        return r.json()
+        return self.decode(r.content)
 
     def start(self):
         """
         Issue a start command to the engine
         """
         return self.__requestAndPoll(
-            "PUT", f"{baseUrl}/vehicles/v2/{self.vin}/engine/start"
+            "PUT", f"{self.baseUrl}/vehicles/v2/{self.vin}/engine/start"
         )
 
     def stop(self):
@@ -251,7 +344,7 @@ class Vehicle(object):
         Issue a stop command to the engine
         """
         return self.__requestAndPoll(
-            "DELETE", f"{baseUrl}/vehicles/v2/{self.vin}/engine/start"
+            "DELETE", f"{self.baseUrl}/vehicles/v2/{self.vin}/engine/start"
         )
 
     def lock(self):
@@ -259,7 +352,7 @@ class Vehicle(object):
         Issue a lock command to the doors
         """
         return self.__requestAndPoll(
-            "PUT", f"{baseUrl}/vehicles/v2/{self.vin}/doors/lock"
+            "PUT", f"{self.baseUrl}/vehicles/v2/{self.vin}/doors/lock"
         )
 
     def unlock(self):
@@ -267,7 +360,7 @@ class Vehicle(object):
         Issue an unlock command to the doors
         """
         return self.__requestAndPoll(
-            "DELETE", f"{baseUrl}/vehicles/v2/{self.vin}/doors/lock"
+            "DELETE", f"{self.baseUrl}/vehicles/v2/{self.vin}/doors/lock"
         )
 
     def enableGuard(self):
@@ -277,7 +370,7 @@ class Vehicle(object):
         self.__acquireToken()
 
         r = self.__makeRequest(
-            "PUT", f"{guardUrl}/guardmode/v1/{self.vin}/session", None, None
+            "PUT", f"{self.guardUrl}/guardmode/v1/{self.vin}/session", None, None
         )
         _LOGGER.debug(r.text)
         return r
@@ -288,7 +381,7 @@ class Vehicle(object):
         """
         self.__acquireToken()
         r = self.__makeRequest(
-            "DELETE", f"{guardUrl}/guardmode/v1/{self.vin}/session", None, None
+            "DELETE", f"{self.guardUrl}/guardmode/v1/{self.vin}/session", None, None
         )
         _LOGGER.debug(r.text)
         return r
@@ -301,7 +394,7 @@ class Vehicle(object):
         else:
             vinnum = self.vin
         status = self.__makeRequest(
-            "PUT", f"{baseUrl}/vehicles/v2/{vinnum}/status", None, None
+            "PUT", f"{self.baseUrl}/vehicles/v2/{vinnum}/status", None, None
         )
         return status.json()["status"]
 
@@ -316,21 +409,36 @@ class Vehicle(object):
             "Application-Id": self.region,
         }
 
-        return getattr(requests, method.lower())(
-            url, headers=headers, data=data, params=params
-        )
+        return self.__send(method, url, headers=headers, data=data, params=params)
+
+    def __send(self, method, url, **kwargs):
+        # Every request goes through here so its latency and status are recorded
+        started = time.monotonic()
+        try:
+            r = self.session.request(method, url, **kwargs)
+        except Exception as ex:
+            elapsed = time.monotonic() - started
+            self.metrics.observe(method, url, type(ex).__name__, elapsed)
+            raise
+        self.metrics.observe(method, url, r.status_code, time.monotonic() - started)
+        return r
 
-    def __pollStatus(self, url, id):
+    def __pollStatus(self, url, id, deadline=120):
         """
         Poll the given URL with the given command ID until the command is completed
         """
-        status = self.__makeRequest("GET", f"{url}/{id}", None, None)
-        result = status.json()
-        if result["status"] == 552:
+        giveUpAt = time.monotonic() + deadline
+        while True:
+            status = self.__makeRequest("GET", f"{url}/{id}", None, None)
+            result = status.json()
+            if result["status"] != 552:
+                break
+            if time.monotonic() >= giveUpAt:
+                _LOGGER.debug("Command still pending after %d seconds", deadline)
+                return False
             _LOGGER.debug("Command is pending")
-            time.sleep(5)
-            return self.__pollStatus(url, id)  # retry after 5s
-        elif result["status"] == 200:
+            time.sleep(5)  # retry after 5s
+        if result["status"] == 200:
             _LOGGER.debug("Command completed succesfully")
             return True
         else:
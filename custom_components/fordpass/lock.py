@@ -3,7 +3,8 @@ import logging
 
 from homeassistant.components.lock import LockEntity
 
-from . import FordPassEntity
+from . import FordPassEntity, async_add_platform_entities
+from .commands import log_result
 from .const import DOMAIN
 
 _LOGGER = logging.getLogger(__name__)
@@ -14,7 +15,7 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
     entry = hass.data[DOMAIN][config_entry.entry_id]
 
     locks = [Lock(entry)]
-    async_add_entities(locks, False)
+    async_add_platform_entities("lock", entry, locks, async_add_entities)
 
 
 class Lock(FordPassEntity, LockEntity):
@@ -27,29 +28,28 @@ class Lock(FordPassEntity, LockEntity):
             name="fordpass_doorlock",
             coordinator=coordinator,
         )
+        self._status_keys = {"lockStatus"}
 
     async def async_lock(self, **kwargs):
         """Locks the vehicle."""
         _LOGGER.debug("Locking %s", self.coordinator.vin)
-        await self.coordinator.hass.async_add_executor_job(
-            self.coordinator.vehicle.lock
-        )
+        result = await self.coordinator.commands.submit("lock")
+        log_result("Locking", self.coordinator.vin, result)
         await self.coordinator.async_request_refresh()
 
     async def async_unlock(self, **kwargs):
         """Unlocks the vehicle."""
         _LOGGER.debug("Unlocking %s", self.coordinator.vin)
-        await self.coordinator.hass.async_add_executor_job(
-            self.coordinator.vehicle.unlock
-        )
+        result = await self.coordinator.commands.submit("unlock")
+        log_result("Unlocking", self.coordinator.vin, result)
         await self.coordinator.async_request_refresh()
 
     @property
     def is_locked(self):
         """Determine if the lock is locked."""
-        if self.coordinator.data is None or self.coordinator.data["lockStatus"] is None:
+        if self.coordinator.data is None or self.coordinator.data.lockStatus is None:
             return None
-        return self.coordinator.data["lockStatus"]["value"] == "LOCKED"
+        return self.coordinator.data.lockStatus.value == "LOCKED"
 
     @property
     def icon(self):
@@ -0,0 +1,179 @@
+"""Latency, status and retry metrics for FordPass API calls."""
+import re
+from urllib.parse import urlsplit
+
+# Upper bounds of the latency histogram buckets in milliseconds
+LATENCY_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+# Endpoint names by method and URL path, a method of None matches any method
+ENDPOINTS = (
+    ("POST", re.compile(r"/token$"), "auth"),
+    ("PUT", re.compile(r"/oauth2/v1/token$"), "auth"),
+    ("PUT", re.compile(r"/oauth2/v1/refresh$"), "refreshToken"),
+    ("GET", re.compile(r"/vehicles/v4/[^/]+/status$"), "status"),
+    ("PUT", re.compile(r"/vehicles/v2/[^/]+/status$"), "requestUpdate"),
+    ("GET", re.compile(r"/guardmode/v1/[^/]+/session$"), "guardStatus"),
+    (None, re.compile(r"/guardmode/v1/[^/]+/session$"), "guardCommand"),
+    ("GET", re.compile(r"/(doors/lock|engine/start)/[^/]+$"), "commandPoll"),
+    (None, re.compile(r"/(doors/lock|engine/start)$"), "command"),
+)
+
+
+def endpointName(method, url):
+    """Return the metrics name of the endpoint a request goes to."""
+    path = urlsplit(url).path
+    for endpointMethod, pattern, name in ENDPOINTS:
+        if endpointMethod in (None, method) and pattern.search(path):
+            return name
+    return "other"
+
+
+class EndpointMetrics(object):
+    # Counters and latency histogram of one endpoint
+
+    __slots__ = (
+        "requests",
+        "errors",
+        "retries",
+        "statuses",
+        "histogram",
+        "total",
+        "last",
+        "maximum",
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.statuses = {}
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.last = None
+        self.maximum = 0.0
+
+    def observe(self, status, elapsed):
+        """Record one finished request, status is an HTTP code or an exception name"""
+        milliseconds = elapsed * 1000
+        self.requests += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors += 1
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if milliseconds <= bound:
+                self.histogram[index] += 1
+                break
+        self.total += milliseconds
+        self.last = milliseconds
+        self.maximum = max(self.maximum, milliseconds)
+
+    def percentile(self, fraction):
+        """Return the upper bound of the bucket holding the fraction of requests"""
+        return _percentile([self], fraction)
+
+    def as_dict(self):
+        mean = round(self.total / self.requests) if self.requests else None
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "statuses": dict(self.statuses),
+            "mean_ms": mean,
+            "last_ms": round(self.last) if self.last is not None else None,
+            "p95_ms": self.percentile(0.95),
+            "histogram_ms": {
+                str(bound): count
+                for bound, count in zip(LATENCY_BUCKETS, self.histogram)
+            },
+        }
+
+
+class ApiMetrics(object):
+    # Per-endpoint metrics of an account or a vehicle, plus token renewal counts
+
+    def __init__(self):
+        self.endpoints = {}
+        self.tokenRefreshes = 0
+        self.authentications = 0
+        self.throttled = 0
+        self.throttleWait = 0.0
+
+    def endpoint(self, name):
+        if name not in self.endpoints:
+            self.endpoints[name] = EndpointMetrics()
+        return self.endpoints[name]
+
+    def observe(self, method, url, status, elapsed):
+        """Record a finished request against the endpoint its URL belongs to"""
+        self.endpoint(endpointName(method, url)).observe(status, elapsed)
+
+    def retry(self, method, url):
+        """Count a retry of a request to the endpoint its URL belongs to"""
+        self.endpoint(endpointName(method, url)).retries += 1
+
+    def throttle(self, waited):
+        """Count a request the rate limiter held back for waited seconds"""
+        self.throttled += 1
+        self.throttleWait += waited
+
+    @property
+    def requests(self):
+        return sum(e.requests for e in self.endpoints.values())
+
+    @property
+    def errors(self):
+        return sum(e.errors for e in self.endpoints.values())
+
+    @property
+    def retries(self):
+        return sum(e.retries for e in self.endpoints.values())
+
+    def percentile(self, fraction):
+        """Return the latency bucket bound holding the fraction across all endpoints"""
+        return _percentile(self.endpoints.values(), fraction)
+
+    def summary(self):
+        """Return the error, retry and token totals and the p95 of each endpoint"""
+        return {
+            "errors": self.errors,
+            "retries": self.retries,
+            "token_refreshes": self.tokenRefreshes,
+            "authentications": self.authentications,
+            "throttled_requests": self.throttled,
+            "throttle_wait_s": round(self.throttleWait, 3),
+            "p95_ms": {
+                name: endpoint.percentile(0.95)
+                for name, endpoint in self.endpoints.items()
+            },
+        }
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "token_refreshes": self.tokenRefreshes,
+            "authentications": self.authentications,
+            "throttled_requests": self.throttled,
+            "throttle_wait_s": round(self.throttleWait, 3),
+            "endpoints": {
+                name: endpoint.as_dict() for name, endpoint in self.endpoints.items()
+            },
+        }
+
+
+def _percentile(endpoints, fraction):
+    """Return the bucket bound holding the fraction of the endpoints' requests.
+
+    The open-ended last bucket reports the slowest request seen instead.
+    """
+    endpoints = list(endpoints)
+    wanted = fraction * sum(e.requests for e in endpoints)
+    if not wanted:
+        return None
+    seen = 0
+    for index, bound in enumerate(LATENCY_BUCKETS[:-1]):
+        seen += sum(e.histogram[index] for e in endpoints)
+        if seen >= wanted:
+            return bound
+    return round(max(e.maximum for e in endpoints))
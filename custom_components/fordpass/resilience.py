@@ -0,0 +1,193 @@
+"""Request pacing, retry backoff and circuit breaking for the FordPass API."""
+import asyncio
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Requests per second and burst size allowed for one account on one host
+accountRate = 2
+accountBurst = 10
+
+# Requests per second and burst size allowed on one host across all accounts
+hostRate = 10
+hostBurst = 30
+
+# Transient failures are retried this many times with full-jitter exponential
+# backoff, as long as the retry still fits in the request's time budget
+retryAttempts = 3
+retryBaseDelay = 1
+retryMaxDelay = 10
+
+# A host's circuit opens after this many consecutive transient failures and
+# lets one probe request through per cooldown until a probe succeeds
+breakerThreshold = 5
+breakerCooldown = 60
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class RequestBudget(object):
+    # Time left for every request of one operation, token requests and retries included
+
+    def __init__(self, seconds):
+        self.deadline = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def extend(self, seconds):
+        # Time queued on the rate limiter is given back, so a large account
+        # spreads its startup requests out instead of timing them out
+        self.deadline += seconds
+
+
+_budget = contextvars.ContextVar("fordpass_request_budget", default=None)
+
+
+@contextmanager
+def requestBudget(seconds):
+    """Bound the requests made in this context, and tasks it starts, to seconds"""
+    token = _budget.set(RequestBudget(seconds))
+    try:
+        yield
+    finally:
+        _budget.reset(token)
+
+
+def currentBudget(seconds):
+    """Return the budget of the running operation, or a new one of seconds"""
+    budget = _budget.get()
+    return budget if budget is not None else RequestBudget(seconds)
+
+
+def backoffDelay(attempt, base=retryBaseDelay, maximum=retryMaxDelay):
+    """Return a random delay before retry number attempt, counting from zero"""
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+class CircuitOpenError(Exception):
+    # Raised instead of sending a request to a host whose circuit is open
+
+    def __init__(self, host):
+        super().__init__(f"Circuit open for {host}, not sending request")
+        self.host = host
+
+
+class TokenBucket(object):
+    # Hands out one token per request, refilling at rate up to burst tokens
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.__lock = asyncio.Lock()
+
+    def __refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait for a token and return the seconds spent waiting, 0 if none"""
+        started = time.monotonic()
+        # Waiters queue on the lock so they are served in arrival order
+        waited = self.__lock.locked()
+        async with self.__lock:
+            self.__refill()
+            while self.tokens < 1:
+                waited = True
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.__refill()
+            self.tokens -= 1
+        return time.monotonic() - started if waited else 0.0
+
+
+class RateLimiter(object):
+    # Token buckets per account and host, and per host across all accounts
+
+    def __init__(
+        self,
+        accountRate=accountRate,
+        accountBurst=accountBurst,
+        hostRate=hostRate,
+        hostBurst=hostBurst,
+    ):
+        self.accountRate = accountRate
+        self.accountBurst = accountBurst
+        self.hostRate = hostRate
+        self.hostBurst = hostBurst
+        self.buckets = {}
+
+    def __bucket(self, key, rate, burst):
+        if key not in self.buckets:
+            self.buckets[key] = TokenBucket(rate, burst)
+        return self.buckets[key]
+
+    async def acquire(self, account, url):
+        """Wait until the account may send to the URL's host and return the wait"""
+        host = urlsplit(url).hostname
+        accountBucket = self.__bucket(
+            (account, host), self.accountRate, self.accountBurst
+        )
+        hostBucket = self.__bucket((None, host), self.hostRate, self.hostBurst)
+        return await accountBucket.acquire() + await hostBucket.acquire()
+
+
+class CircuitBreaker(object):
+    # Stops requests to a host after repeated transient failures, probing it to recover
+
+    def __init__(self, host, threshold=breakerThreshold, cooldown=breakerCooldown):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.probeAt = None
+
+    def allow(self):
+        """Return True if a request may be sent now"""
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        now = time.monotonic()
+        if now < self.probeAt:
+            return False
+        # Let this request through as the probe, another one follows a cooldown
+        # later if it never reports back
+        self.state = CIRCUIT_HALF_OPEN
+        self.probeAt = now + self.cooldown
+        return True
+
+    def success(self):
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.probeAt = None
+
+    def failure(self):
+        self.failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.threshold:
+            self.state = CIRCUIT_OPEN
+            self.probeAt = time.monotonic() + self.cooldown
+
+
+class CircuitBreakers(object):
+    # One circuit breaker per host, shared by every account
+
+    def __init__(self, threshold=breakerThreshold, cooldown=breakerCooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.breakers = {}
+
+    def breaker(self, url):
+        """Return the circuit breaker of the URL's host"""
+        host = urlsplit(url).hostname
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(host, self.threshold, self.cooldown)
+        return self.breakers[host]
+
+    def as_dict(self):
+        return {host: b.state for host, b in self.breakers.items()}
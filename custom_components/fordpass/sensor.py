@@ -1,10 +1,10 @@
 import logging
-from datetime import datetime, timedelta
 
+from homeassistant.const import ENTITY_CATEGORY_DIAGNOSTIC
 from homeassistant.helpers.entity import Entity
-from homeassistant.util import Throttle, dt
+from homeassistant.util import slugify
 
-from . import FordPassEntity
+from . import ACCOUNT_SENSORS, FordPassEntity, async_add_platform_entities
 from .const import CONF_PRESSURE_UNIT, CONF_DISTANCE_UNIT, DOMAIN, SENSORS
 
 _LOGGER = logging.getLogger(__name__)
@@ -14,18 +14,221 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
     """Add the Entities from the config."""
     entry = hass.data[DOMAIN][config_entry.entry_id]
 
+    sensors = []
     for key, value in SENSORS.items():
-        sensor = CarSensor(entry, key, config_entry.options)
         # Add support for only adding compatible sensors for the given vehicle
-        _LOGGER.debug(sensor.coordinator.data)
-        if key == "zoneLighting":
-            if "zoneLighting" in sensor.coordinator.data:
-                async_add_entities([sensor], True)
-        elif key == "elVeh":
-            if sensor.coordinator.data["elVehDTE"] != None:
-                async_add_entities([sensor], True)
-        else:
-            async_add_entities([sensor], True)
+        if key == "zoneLighting" and not entry.capabilities.zoneLighting:
+            continue
+        if key == "elVeh" and not entry.capabilities.elVeh:
+            continue
+        sensors.append(CarSensor(entry, key, config_entry.options))
+
+    # API metrics for the vehicle, and once per account for the shared login
+    sensors.append(ApiMetricsSensor(entry, entry.vehicle.metrics))
+    owners = hass.data[DOMAIN].setdefault(ACCOUNT_SENSORS, {})
+    if entry.account.username not in owners:
+        owners[entry.account.username] = config_entry.entry_id
+        sensors.append(AccountMetricsSensor(entry))
+
+    def add_account_sensor():
+        async_add_entities([AccountMetricsSensor(entry)])
+        return config_entry.entry_id
+
+    entry.add_account_sensor = add_account_sensor
+
+    async_add_platform_entities("sensor", entry, sensors, async_add_entities)
+
+
+def _value(key):
+    """Build an extractor returning the value of a status reading."""
+
+    def extract(data, options):
+        reading = getattr(data, key)
+        return reading.value if reading is not None else None
+
+    return extract
+
+
+def _items(key):
+    """Build an extractor returning every field of a status section."""
+
+    def extract(data, options):
+        section = getattr(data, key)
+        return section._asdict() if section is not None else None
+
+    return extract
+
+
+def _none(data, options):
+    return None
+
+
+def _derived(data, options, name):
+    """Return one of the snapshot's values converted to the configured units."""
+    return data.derived(name, options[CONF_DISTANCE_UNIT], options[CONF_PRESSURE_UNIT])
+
+
+def _odometer_state(data, options):
+    return _derived(data, options, "odometer")
+
+
+def _odometer_unit(data, options):
+    if options[CONF_DISTANCE_UNIT] == "mi":
+        return "mi"
+    return "km"
+
+
+def _fuel_state(data, options):
+    if data.fuel == None or data.fuel.fuelLevel == None:
+        return None
+    return round(data.fuel.fuelLevel)
+
+
+def _fuel_unit(data, options):
+    return "%"
+
+
+def _fuel_attrs(data, options):
+    return _derived(data, options, "fuel")
+
+
+def _battery_state(data, options):
+    if data.battery == None:
+        return None
+    return data.battery.batteryHealth
+
+
+def _battery_attrs(data, options):
+    if data.battery == None:
+        return None
+    return {"Battery Voltage": data.battery.batteryStatusActual}
+
+
+def _oil_state(data, options):
+    if data.oil == None:
+        return None
+    return data.oil.oilLife
+
+
+def _tire_pressure_attrs(data, options):
+    return _derived(data, options, "tirePressures")
+
+
+def _gps_state(data, options):
+    if data.gps == None:
+        return "Unsupported"
+    return data.gps.gpsState
+
+
+def _door_state(data, options):
+    return _derived(data, options, "doorState")
+
+
+def _door_attrs(data, options):
+    return data.doorStatus
+
+
+def _window_state(data, options):
+    return _derived(data, options, "windowState")
+
+
+def _window_attrs(data, options):
+    return _derived(data, options, "windows")
+
+
+def _last_refresh_state(data, options):
+    return data.refreshedAt
+
+
+def _elveh_state(data, options):
+    if data.elVehDTE != None:
+        return data.elVehDTE.value
+    return "Unsupported"
+
+
+# Attribute name for each EV status key that is reported when present
+ELVEH_ATTRIBUTES = {
+    "elVehDTE": "elVehDTE",
+    "plugStatus": "Plug Status",
+    "chargeStartTime": "Charge Start Time",
+    "chargeEndTime": "Charge End Time",
+    "batteryFillLevel": "Battery Fill Level",
+    "chargerPowertype": "Charger Power Type",
+    "batteryChargeStatus": "Battery Charge Status",
+    "batteryPerfStatus": "Battery Performance Status",
+}
+
+
+def _elveh_attrs(data, options):
+    if data.elVehDTE == None:
+        return None
+    elecs = dict()
+    for key, name in ELVEH_ATTRIBUTES.items():
+        reading = getattr(data, key)
+        if reading != None and reading.value != None:
+            elecs[name] = reading.value
+    return elecs
+
+
+def _zone_lighting_state(data, options):
+    if data.zoneLighting != None and data.zoneLighting.activationData != None:
+        return data.zoneLighting.activationData
+    return "Unsupported"
+
+
+def _zone_lighting_attrs(data, options):
+    lighting = data.zoneLighting
+    if lighting != None and lighting.zoneStatusData != None:
+        zone = dict()
+        for key, value in lighting.zoneStatusData.items():
+            zone["zone_" + key] = value
+
+        if lighting.lightSwitchStatusData != None:
+            zone.update(lighting.lightSwitchStatusData)
+
+        if lighting.zoneLightingFaultStatus != None:
+            zone["zoneLightingFaultStatus"] = lighting.zoneLightingFaultStatus
+        if lighting.zoneLightingShutDownWarning != None:
+            zone["zoneLightingShutDownWarning"] = lighting.zoneLightingShutDownWarning
+        return zone
+    return None
+
+
+def _remote_start_state(data, options):
+    if data.remoteStartStatus == None:
+        return None
+    if data.remoteStartStatus.value == 1:
+        return "Active"
+    return "Inactive"
+
+
+# (state, unit, attributes) extractors for each key in SENSORS, bound once per entity
+EXTRACTORS = {
+    "odometer": (_odometer_state, _odometer_unit, _items("odometer")),
+    "fuel": (_fuel_state, _fuel_unit, _fuel_attrs),
+    "battery": (_battery_state, _none, _battery_attrs),
+    "oil": (_oil_state, _none, _items("oil")),
+    "tirePressure": (_value("tirePressure"), _none, _tire_pressure_attrs),
+    "gps": (_gps_state, _none, _items("gps")),
+    "alarm": (_value("alarm"), _none, _items("alarm")),
+    "ignitionStatus": (_value("ignitionStatus"), _none, _items("ignitionStatus")),
+    "doorStatus": (_door_state, _none, _door_attrs),
+    "windowPosition": (_window_state, _none, _window_attrs),
+    "lastRefresh": (_last_refresh_state, _none, _none),
+    "elVeh": (_elveh_state, _none, _elveh_attrs),
+    "deepSleepInProgress": (
+        _value("deepSleepInProgress"),
+        _none,
+        _items("deepSleepInProgress"),
+    ),
+    "firmwareUpgInProgress": (
+        _value("firmwareUpgInProgress"),
+        _none,
+        _items("firmwareUpgInProgress"),
+    ),
+    "remoteStartStatus": (_remote_start_state, _none, _items("remoteStart")),
+    "zoneLighting": (_zone_lighting_state, _none, _zone_lighting_attrs),
+}
 
 
 class CarSensor(
@@ -39,329 +242,8 @@ class CarSensor(
         self._attr = {}
         self.coordinator = coordinator
         self._device_id = "fordpass_" + sensor
-
-    def get_value(self, ftype):
-        if ftype == "state":
-            if self.sensor == "odometer":
-                if self.options[CONF_DISTANCE_UNIT] == "mi":
-                    return round(
-                        float(self.coordinator.data[self.sensor]["value"]) / 1.60934
-                    )
-                else:
-                    return self.coordinator.data[self.sensor]["value"]
-            elif self.sensor == "fuel":
-                if self.coordinator.data[self.sensor] == None:
-                    return None
-                return round(self.coordinator.data[self.sensor]["fuelLevel"])
-            elif self.sensor == "battery":
-                return self.coordinator.data[self.sensor]["batteryHealth"]["value"]
-            elif self.sensor == "oil":
-                return self.coordinator.data[self.sensor]["oilLife"]
-            elif self.sensor == "tirePressure":
-                return self.coordinator.data[self.sensor]["value"]
-            elif self.sensor == "gps":
-                if self.coordinator.data[self.sensor] == None:
-                    return "Unsupported"
-                return self.coordinator.data[self.sensor]["gpsState"]
-            elif self.sensor == "alarm":
-                return self.coordinator.data[self.sensor]["value"]
-            elif self.sensor == "ignitionStatus":
-                return self.coordinator.data[self.sensor]["value"]
-            elif self.sensor == "firmwareUpgInProgress":
-                return self.coordinator.data[self.sensor]["value"]
-            elif self.sensor == "deepSleepInProgress":
-                return self.coordinator.data[self.sensor]["value"]
-            elif self.sensor == "doorStatus":
-                for key, value in self.coordinator.data[self.sensor].items():
-                    if value["value"] == "Invalid":
-                        continue
-                    if value["value"] != "Closed":
-                        return "Open"
-                return "Closed"
-            elif self.sensor == "windowPosition":
-                if self.coordinator.data[self.sensor] == None:
-                    return "Unsupported"
-                for key, value in self.coordinator.data[self.sensor].items():
-                    if "open" in value["value"].lower():
-                        return "Open"
-                    elif "closed" in value["value"].lower():
-                        return "Closed"
-                return "Unsupported"
-            elif self.sensor == "lastRefresh":
-                return dt.as_local(
-                    datetime.strptime(
-                        self.coordinator.data[self.sensor], "%m-%d-%Y %H:%M:%S"
-                    )
-                )
-            elif self.sensor == "elVeh":
-                if self.coordinator.data["elVehDTE"] != None:
-                    return self.coordinator.data["elVehDTE"]["value"]
-                else:
-                    return "Unsupported"
-            elif self.sensor == "zoneLighting":
-                if "zoneLighting" not in self.coordinator.data:
-                    return "Unsupported"
-                if (
-                    self.coordinator.data["zoneLighting"] != None
-                    and self.coordinator.data["zoneLighting"]["activationData"] != None
-                ):
-                    return self.coordinator.data["zoneLighting"]["activationData"][
-                        "value"
-                    ]
-                else:
-                    return "Unsupported"
-            elif self.sensor == "remoteStartStatus":
-                if self.coordinator.data["remoteStartStatus"] == None:
-                    return None
-                else:
-                    if self.coordinator.data["remoteStartStatus"]["value"] == 1:
-                        return "Active"
-                    else:
-                        return "Inactive"
-        elif ftype == "measurement":
-            if self.sensor == "odometer":
-                if self.options[CONF_DISTANCE_UNIT] == "mi":
-                    return "mi"
-                else:
-                    return "km"
-            elif self.sensor == "fuel":
-                return "%"
-            elif self.sensor == "battery":
-                return None
-            elif self.sensor == "oil":
-                return None
-            elif self.sensor == "tirePressure":
-                return None
-            elif self.sensor == "gps":
-                return None
-            elif self.sensor == "alarm":
-                return None
-            elif self.sensor == "ignitionStatus":
-                return None
-            elif self.sensor == "firmwareUpgInProgress":
-                return None
-            elif self.sensor == "deepSleepInProgress":
-                return None
-            elif self.sensor == "doorStatus":
-                return None
-            elif self.sensor == "windowsPosition":
-                return None
-            elif self.sensor == "lastRefresh":
-                return None
-            elif self.sensor == "zoneLighting":
-                return None
-            elif self.sensor == "remoteStartStatus":
-                return None
-        elif ftype == "attribute":
-            if self.sensor == "odometer":
-                return self.coordinator.data[self.sensor].items()
-            elif self.sensor == "fuel":
-                if self.coordinator.data[self.sensor] == None:
-                    return None
-                if self.options[CONF_DISTANCE_UNIT] == "mi":
-                    self.coordinator.data["fuel"]["distanceToEmpty"] = round(float(self.coordinator.data["fuel"]["distanceToEmpty"]) / 1.60934)
-                return self.coordinator.data[self.sensor].items()
-            elif self.sensor == "battery":
-                return {
-                    "Battery Voltage": self.coordinator.data[self.sensor][
-                        "batteryStatusActual"
-                    ]["value"]
-                }
-            elif self.sensor == "oil":
-                return self.coordinator.data[self.sensor].items()
-            elif self.sensor == "tirePressure":
-                if self.coordinator.data["TPMS"] != None:
-                    if self.options[CONF_PRESSURE_UNIT] == "PSI":
-                        sval = 0.1450377377
-                    else:
-                        sval = 1
-                    return {
-                        "leftFrontTirePressure": round(
-                            float(
-                                self.coordinator.data["TPMS"]["leftFrontTirePressure"][
-                                    "value"
-                                ]
-                                or 0
-                            )
-                            * sval
-                        ),
-                        "rightFrontTirePressure": round(
-                            float(
-                                self.coordinator.data["TPMS"]["rightFrontTirePressure"][
-                                    "value"
-                                ]
-                                or 0
-                            )
-                            * sval
-                        ),
-                        "outerLeftRearTirePressure": round(
-                            float(
-                                self.coordinator.data["TPMS"][
-                                    "outerLeftRearTirePressure"
-                                ]["value"]
-                                or 0
-                            )
-                            * sval
-                        ),
-                        "outerRightRearTirePressure": round(
-                            float(
-                                self.coordinator.data["TPMS"][
-                                    "outerRightRearTirePressure"
-                                ]["value"]
-                                or 0
-                            )
-                            * sval
-                        ),
-                    }
-                return None
-            elif self.sensor == "gps":
-                if self.coordinator.data[self.sensor] == None:
-                    return None
-                return self.coordinator.data[self.sensor].items()
-            elif self.sensor == "alarm":
-                return self.coordinator.data[self.sensor].items()
-            elif self.sensor == "ignitionStatus":
-                return self.coordinator.data[self.sensor].items()
-            elif self.sensor == "firmwareUpgInProgress":
-                return self.coordinator.data[self.sensor].items()
-            elif self.sensor == "deepSleepInProgress":
-                return self.coordinator.data[self.sensor].items()
-            elif self.sensor == "doorStatus":
-                doors = dict()
-                for key, value in self.coordinator.data[self.sensor].items():
-                    doors[key] = value["value"]
-                return doors
-            elif self.sensor == "windowPosition":
-                if self.coordinator.data[self.sensor] == None:
-                    return None
-                windows = dict()
-                for key, value in self.coordinator.data[self.sensor].items():
-                    windows[key] = value["value"]
-                    if "open" in value["value"].lower():
-                        if "btwn" in value["value"].lower():
-                            windows[key] = "Open-Partial"
-                        else:
-                            windows[key] = "Open"
-                    elif "closed" in value["value"].lower():
-                        windows[key] = "Closed"
-                return windows
-            elif self.sensor == "lastRefresh":
-                return None
-            elif self.sensor == "elVeh":
-                if self.coordinator.data["elVehDTE"] == None:
-                    return None
-                else:
-                    elecs = dict()
-                    if (
-                        self.coordinator.data["elVehDTE"] != None
-                        and self.coordinator.data["elVehDTE"]["value"] != None
-                    ):
-                        elecs["elVehDTE"] = self.coordinator.data["elVehDTE"]["value"]
-                    if (
-                        self.coordinator.data["plugStatus"] != None
-                        and self.coordinator.data["plugStatus"]["value"] != None
-                    ):
-                        elecs["Plug Status"] = self.coordinator.data["plugStatus"][
-                            "value"
-                        ]
-
-                    if (
-                        self.coordinator.data["chargeStartTime"] != None
-                        and self.coordinator.data["chargeStartTime"]["value"] != None
-                    ):
-                        elecs["Charge Start Time"] = self.coordinator.data[
-                            "chargeStartTime"
-                        ]["value"]
-
-                    if (
-                        self.coordinator.data["chargeEndTime"] != None
-                        and self.coordinator.data["chargeEndTime"]["value"] != None
-                    ):
-                        elecs["Charge End Time"] = self.coordinator.data[
-                            "chargeEndTime"
-                        ]["value"]
-
-                    if (
-                        self.coordinator.data["batteryFillLevel"] != None
-                        and self.coordinator.data["batteryFillLevel"]["value"] != None
-                    ):
-                        elecs["Battery Fill Level"] = self.coordinator.data[
-                            "batteryFillLevel"
-                        ]["value"]
-
-                    if (
-                        self.coordinator.data["chargerPowertype"] != None
-                        and self.coordinator.data["chargerPowertype"]["value"] != None
-                    ):
-                        elecs["Charger Power Type"] = self.coordinator.data[
-                            "chargerPowertype"
-                        ]["value"]
-
-                    if (
-                        self.coordinator.data["batteryChargeStatus"] != None
-                        and self.coordinator.data["batteryChargeStatus"]["value"]
-                        != None
-                    ):
-                        elecs["Battery Charge Status"] = self.coordinator.data[
-                            "batteryChargeStatus"
-                        ]["value"]
-
-                    if (
-                        self.coordinator.data["batteryPerfStatus"] != None
-                        and self.coordinator.data["batteryPerfStatus"]["value"] != None
-                    ):
-                        elecs["Battery Performance Status"] = self.coordinator.data[
-                            "batteryPerfStatus"
-                        ]["value"]
-
-                    return elecs
-            elif self.sensor == "zoneLighting":
-                if "zoneLighting" not in self.coordinator.data:
-                    return None
-                if (
-                    self.coordinator.data[self.sensor] != None
-                    and self.coordinator.data[self.sensor]["zoneStatusData"] != None
-                ):
-                    zone = dict()
-                    if self.coordinator.data[self.sensor]["zoneStatusData"] != None:
-                        for key, value in self.coordinator.data[self.sensor][
-                            "zoneStatusData"
-                        ].items():
-                            zone["zone_" + key] = value["value"]
-
-                    if (
-                        self.coordinator.data[self.sensor]["lightSwitchStatusData"]
-                        != None
-                    ):
-                        for key, value in self.coordinator.data[self.sensor][
-                            "lightSwitchStatusData"
-                        ].items():
-                            zone[key] = value["value"]
-
-                    if (
-                        self.coordinator.data[self.sensor]["zoneLightingFaultStatus"]
-                        != None
-                    ):
-                        zone["zoneLightingFaultStatus"] = self.coordinator.data[
-                            self.sensor
-                        ]["zoneLightingFaultStatus"]["value"]
-                    if (
-                        self.coordinator.data[self.sensor][
-                            "zoneLightingShutDownWarning"
-                        ]
-                        != None
-                    ):
-                        zone["zoneLightingShutDownWarning"] = self.coordinator.data[
-                            self.sensor
-                        ]["zoneLightingShutDownWarning"]["value"]
-                    return zone
-                else:
-                    return None
-            elif self.sensor == "remoteStartStatus":
-                if self.coordinator.data["remoteStart"] == None:
-                    return None
-                else:
-                    return self.coordinator.data["remoteStart"].items()
+        self._status_keys = set(SENSORS[sensor].get("keys", (sensor,)))
+        self._state_fn, self._unit_fn, self._attrs_fn = EXTRACTORS[sensor]
 
     @property
     def name(self):
@@ -369,7 +251,7 @@ class CarSensor(
 
     @property
     def state(self):
-        return self.get_value("state")
+        return self._state_fn(self.coordinator.data, self.options)
 
     @property
     def device_id(self):
@@ -377,12 +259,84 @@ class CarSensor(
 
     @property
     def device_state_attributes(self):
-        return self.get_value("attribute")
+        attributes = self._attrs_fn(self.coordinator.data, self.options)
+        return {**dict(attributes or {}), **super().device_state_attributes}
 
     @property
     def unit_of_measurement(self):
-        return self.get_value("measurement")
+        return self._unit_fn(self.coordinator.data, self.options)
 
     @property
     def icon(self):
         return SENSORS[self.sensor]["icon"]
+
+
+class ApiMetricsSensor(FordPassEntity, Entity):
+    """Diagnostic sensor with the 95th percentile FordPass API latency.
+
+    Attributes only hold values that change rarely between polls, request counts
+    and histograms stay in the metrics, and state is written only when it changed.
+    """
+
+    def __init__(self, coordinator, metrics):
+        self.coordinator = coordinator
+        self.metrics = metrics
+        self._attr = {}
+        self._device_id = "fordpass_api"
+        self._name = "fordpass_api_latency"
+        self._written_metrics = None
+
+    def _shown_changed(self, changed):
+        shown = (self.state, self.device_state_attributes)
+        if shown == self._written_metrics:
+            return False
+        self._written_metrics = shown
+        return True
+
+    @property
+    def state(self):
+        return self.metrics.percentile(0.95)
+
+    @property
+    def unit_of_measurement(self):
+        return "ms"
+
+    @property
+    def device_state_attributes(self):
+        return {
+            **self.metrics.summary(),
+            "coalesced_commands": self.coordinator.commands.coalesced,
+            **super().device_state_attributes,
+        }
+
+    @property
+    def entity_category(self):
+        return ENTITY_CATEGORY_DIAGNOSTIC
+
+    @property
+    def icon(self):
+        return "mdi:api"
+
+
+class AccountMetricsSensor(ApiMetricsSensor):
+    """Diagnostic sensor with the API metrics of every vehicle on an account."""
+
+    def __init__(self, coordinator):
+        super().__init__(coordinator, coordinator.account.metrics)
+        username = slugify(coordinator.account.username)
+        self._device_id = None
+        self._name = f"fordpass_account_api_latency_{username}"
+
+    @property
+    def unique_id(self):
+        return f"fordpass-account-{slugify(self.coordinator.account.username)}-api"
+
+    @property
+    def device_state_attributes(self):
+        account = self.coordinator.account
+        return {
+            **self.metrics.summary(),
+            "coalesced_token_refreshes": account.coalescedRefreshes,
+            "new_connections": account.connectionStats.new,
+            "circuits": account.breakers.as_dict() if account.breakers else {},
+        }
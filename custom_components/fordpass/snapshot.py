@@ -0,0 +1,405 @@
+"""Typed snapshot of the vehicle status fields the platforms use."""
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional
+
+from homeassistant.util import dt
+
+KM_PER_MILE = 1.60934
+
+PSI_PER_KPA = 0.1450377377
+
+TIRES = (
+    "leftFrontTirePressure",
+    "rightFrontTirePressure",
+    "outerLeftRearTirePressure",
+    "outerRightRearTirePressure",
+)
+
+REFRESH_FORMAT = "%m-%d-%Y %H:%M:%S"
+
+
+def _number(value):
+    """Return a reported number as a float, or None if it is not numeric."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _integer(value):
+    """Return a reported number as an int, or None if it is not numeric."""
+    number = _number(value)
+    return None if number is None else int(number)
+
+
+def _text(value):
+    """Return a reported value as a string, or None if there is none."""
+    return None if value is None else str(value)
+
+
+def _flag(value):
+    """Return a reported boolean, which the API sends as a bool or a string."""
+    if value in (True, "true"):
+        return True
+    if value in (False, "false"):
+        return False
+    return None
+
+
+def _raw(value):
+    """Return a value only ever shown as reported."""
+    return value
+
+
+def _value(reading):
+    """Return the value field of a raw reading, or None if it is malformed."""
+    return reading.get("value") if isinstance(reading, dict) else None
+
+
+class Reading(NamedTuple):
+    """One value the car reported, converted to its type, with its status."""
+
+    value: Any
+    status: Optional[str]
+    timestamp: Optional[str]
+
+
+class Battery(NamedTuple):
+    batteryHealth: Optional[str]
+    batteryStatusActual: Optional[float]
+
+
+class Fuel(NamedTuple):
+    fuelLevel: Optional[float]
+    distanceToEmpty: Optional[float]
+    status: Optional[str]
+    timestamp: Optional[str]
+
+
+class Gps(NamedTuple):
+    latitude: Optional[float]
+    longitude: Optional[float]
+    gpsState: Optional[str]
+    status: Optional[str]
+    timestamp: Optional[str]
+
+
+class Oil(NamedTuple):
+    oilLife: Optional[str]
+    oilLifeActual: Optional[float]
+    status: Optional[str]
+    timestamp: Optional[str]
+
+
+class RemoteStart(NamedTuple):
+    remoteStartDuration: Optional[int]
+    remoteStartTime: Optional[int]
+    status: Optional[str]
+    timestamp: Optional[str]
+
+
+class ZoneLighting(NamedTuple):
+    activationData: Optional[str]
+    zoneStatusData: Optional[Dict[str, Any]]
+    lightSwitchStatusData: Optional[Dict[str, Any]]
+    zoneLightingFaultStatus: Any
+    zoneLightingShutDownWarning: Any
+
+
+class ReadingSection:
+    """A value, status and timestamp section, its value converted by convert."""
+
+    def __init__(self, convert):
+        self.convert = convert
+
+    def parse(self, section):
+        return Reading(
+            self.convert(section.get("value")),
+            _text(section.get("status")),
+            _text(section.get("timestamp")),
+        )
+
+    def unparse(self, value):
+        return value._asdict()
+
+
+class RecordSection:
+    """A flat section read into a named tuple, each field with its converter."""
+
+    def __init__(self, record, **converters):
+        self.record = record
+        self.converters = converters
+
+    def parse(self, section):
+        return self.record(
+            *(
+                self.converters.get(name, _text)(section.get(name))
+                for name in self.record._fields
+            )
+        )
+
+    def unparse(self, value):
+        return value._asdict()
+
+
+class ValuesSection:
+    """A section of named readings kept as a mapping of their converted values."""
+
+    def __init__(self, convert, names=None):
+        self.convert = convert
+        self.names = names
+
+    def parse(self, section):
+        names = self.names if self.names is not None else section.keys()
+        return {
+            name: self.convert(_value(section[name]))
+            for name in names
+            if name in section
+        }
+
+    def unparse(self, value):
+        return {name: {"value": item} for name, item in value.items()}
+
+
+class BatterySection:
+    """The battery health and voltage readings."""
+
+    def parse(self, section):
+        return Battery(
+            _text(_value(section.get("batteryHealth"))),
+            _number(_value(section.get("batteryStatusActual"))),
+        )
+
+    def unparse(self, value):
+        return {name: {"value": item} for name, item in value._asdict().items()}
+
+
+class ZoneLightingSection:
+    """The activation, zone, light switch and fault readings of zone lighting."""
+
+    def parse(self, section):
+        zones = section.get("zoneStatusData")
+        switches = section.get("lightSwitchStatusData")
+        return ZoneLighting(
+            _text(_value(section.get("activationData"))),
+            _values(zones) if isinstance(zones, dict) else None,
+            _values(switches) if isinstance(switches, dict) else None,
+            _value(section.get("zoneLightingFaultStatus")),
+            _value(section.get("zoneLightingShutDownWarning")),
+        )
+
+    def unparse(self, value):
+        section = {}
+        for name, item in value._asdict().items():
+            if name in ("zoneStatusData", "lightSwitchStatusData"):
+                section[name] = None if item is None else _readings(item)
+            else:
+                section[name] = None if item is None else {"value": item}
+        return section
+
+
+def _values(section):
+    return {name: _value(reading) for name, reading in section.items()}
+
+
+def _readings(values):
+    return {name: {"value": value} for name, value in values.items()}
+
+
+# How each vehiclestatus section the platforms read is typed, the rest is dropped
+SECTIONS = {
+    "alarm": ReadingSection(_text),
+    "battery": BatterySection(),
+    "batteryChargeStatus": ReadingSection(_raw),
+    "batteryFillLevel": ReadingSection(_raw),
+    "batteryPerfStatus": ReadingSection(_raw),
+    "chargeEndTime": ReadingSection(_raw),
+    "chargeStartTime": ReadingSection(_raw),
+    "chargerPowertype": ReadingSection(_raw),
+    "deepSleepInProgress": ReadingSection(_flag),
+    "doorStatus": ValuesSection(_text),
+    "elVehDTE": ReadingSection(_number),
+    "firmwareUpgInProgress": ReadingSection(_flag),
+    "fuel": RecordSection(Fuel, fuelLevel=_number, distanceToEmpty=_number),
+    "gps": RecordSection(Gps, latitude=_number, longitude=_number),
+    "ignitionStatus": ReadingSection(_text),
+    "lockStatus": ReadingSection(_text),
+    "odometer": ReadingSection(_number),
+    "oil": RecordSection(Oil, oilLifeActual=_number),
+    "plugStatus": ReadingSection(_raw),
+    "remoteStart": RecordSection(
+        RemoteStart, remoteStartDuration=_integer, remoteStartTime=_integer
+    ),
+    "remoteStartStatus": ReadingSection(_integer),
+    "tirePressure": ReadingSection(_text),
+    # Pressures in kPa, a tire reported without a value reads 0 like it always has
+    "TPMS": ValuesSection(lambda value: _number(value or 0), TIRES),
+    "windowPosition": ValuesSection(_text),
+    "zoneLighting": ZoneLightingSection(),
+}
+
+# Every field a snapshot carries, compared between refreshes
+FIELDS = tuple(SECTIONS) + ("lastRefresh", "guardstatus")
+
+
+class VehicleSnapshot:
+    """Status of one refresh, parsed once into typed slots the entities read."""
+
+    __slots__ = FIELDS + ("refreshedAt", "_derived")
+
+    # lastRefresh is kept as reported, it is the cursor of incremental fetches
+    lastRefresh: Optional[str]
+    refreshedAt: Optional[datetime]
+    guardstatus: dict
+
+    def __init__(self, status, guardstatus=None):
+        """Parse the used sections out of a vehiclestatus payload.
+
+        A malformed section is dropped on its own, leaving the others in place.
+        """
+        for name, section in SECTIONS.items():
+            value = status.get(name)
+            if isinstance(value, dict):
+                try:
+                    value = section.parse(value)
+                except (AttributeError, KeyError, TypeError, ValueError):
+                    value = None
+            else:
+                value = None
+            setattr(self, name, value)
+        self.lastRefresh = status.get("lastRefresh")
+        try:
+            self.refreshedAt = dt.as_local(
+                datetime.strptime(self.lastRefresh, REFRESH_FORMAT)
+            )
+        except (TypeError, ValueError):
+            self.refreshedAt = None
+        self.guardstatus = guardstatus or {}
+        self._derived = {}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a snapshot stored with as_dict."""
+        return cls(data["vehiclestatus"], data["guardstatus"])
+
+    def as_dict(self):
+        """Return the snapshot as JSON-serializable data for storage.
+
+        The sections are written back in the shape of the vehiclestatus payload,
+        so snapshots stored before they were typed still load.
+        """
+        status = {
+            name: section.unparse(getattr(self, name))
+            for name, section in SECTIONS.items()
+            if getattr(self, name) is not None
+        }
+        status["lastRefresh"] = self.lastRefresh
+        return {"vehiclestatus": status, "guardstatus": self.guardstatus}
+
+    def with_guardstatus(self, guardstatus):
+        """Return a copy of the snapshot carrying a newer guard status."""
+        snapshot = object.__new__(VehicleSnapshot)
+        for name in FIELDS + ("refreshedAt",):
+            setattr(snapshot, name, getattr(self, name))
+        snapshot.guardstatus = guardstatus or {}
+        # Derived values never depend on the guard status
+        snapshot._derived = self._derived
+        return snapshot
+
+    def changed(self, previous):
+        """Return the names of the fields that differ from a previous snapshot."""
+        return {
+            name for name in FIELDS if getattr(self, name) != getattr(previous, name)
+        }
+
+    def derived(self, name, distance_unit=None, pressure_unit=None):
+        """Return one derived value for a choice of units, computed once."""
+        convert, units = DERIVED[name]
+        unit = {"distance": distance_unit, "pressure": pressure_unit}.get(units)
+        key = (name, unit)
+        if key not in self._derived:
+            self._derived[key] = convert(self, unit)
+        return self._derived[key]
+
+
+# Each derived value is converted on its own, so a malformed section only leaves
+# the values read from it empty and never fails the other sensors
+
+
+def _odometer(snapshot, unit):
+    if snapshot.odometer is None:
+        return None
+    value = snapshot.odometer.value
+    return _miles(value) if unit == "mi" else value
+
+
+def _fuel(snapshot, unit):
+    if snapshot.fuel is None:
+        return None
+    fuel = snapshot.fuel._asdict()
+    if unit == "mi":
+        fuel["distanceToEmpty"] = _miles(fuel["distanceToEmpty"])
+    return fuel
+
+
+def _tire_pressures(snapshot, unit):
+    if snapshot.TPMS is None:
+        return None
+    scale = PSI_PER_KPA if unit == "PSI" else 1
+    pressures = {}
+    for tire in TIRES:
+        pressure = snapshot.TPMS.get(tire)
+        pressures[tire] = None if pressure is None else round(pressure * scale)
+    return pressures
+
+
+def _door_state(snapshot, unit):
+    if snapshot.doorStatus is None:
+        return None
+    for value in snapshot.doorStatus.values():
+        if value not in ("Invalid", "Closed"):
+            return "Open"
+    return "Closed"
+
+
+def _windows(snapshot, unit):
+    if snapshot.windowPosition is None:
+        return None
+    windows = {}
+    for window, value in snapshot.windowPosition.items():
+        position = value.lower() if value is not None else ""
+        if "open" in position:
+            windows[window] = "Open-Partial" if "btwn" in position else "Open"
+        elif "closed" in position:
+            windows[window] = "Closed"
+        else:
+            windows[window] = value
+    return windows
+
+
+def _window_state(snapshot, unit):
+    # The first window reported open or closed decides the state
+    for position in (snapshot.derived("windows") or {}).values():
+        if position in ("Open", "Open-Partial"):
+            return "Open"
+        if position == "Closed":
+            return "Closed"
+    return "Unsupported"
+
+
+# Function computing each derived value and the unit choice it depends on
+DERIVED = {
+    "odometer": (_odometer, "distance"),
+    "fuel": (_fuel, "distance"),
+    "tirePressures": (_tire_pressures, "pressure"),
+    "doorState": (_door_state, None),
+    "windows": (_windows, None),
+    "windowState": (_window_state, None),
+}
+
+
+def _miles(value):
+    """Return a distance in km as whole miles, or None if it is not numeric."""
+    if value is None:
+        return None
+    return round(value / KM_PER_MILE)
@@ -2,7 +2,8 @@ import logging
 
 from homeassistant.components.switch import SwitchEntity
 
-from . import FordPassEntity
+from . import FordPassEntity, async_add_platform_entities
+from .commands import log_result
 from .const import DOMAIN, SWITCHES
 
 _LOGGER = logging.getLogger(__name__)
@@ -12,19 +13,14 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
     """Add the Switch from the config."""
     entry = hass.data[DOMAIN][config_entry.entry_id]
 
-    # switches = [Switch(entry)]
-    # async_add_entities(switches, False)
+    switches = []
     for key, value in SWITCHES.items():
-        sw = Switch(entry, key, config_entry.options)
         # Only add guard entity if supported by the car
-        if key == "guardmode":
-            if "guardstatus" in sw.coordinator.data:
-                if sw.coordinator.data["guardstatus"]["returnCode"] == 200:
-                    async_add_entities([sw], False)
-                else:
-                    _LOGGER.debug("Guard mode not supported on this vehicle")
-        else:
-            async_add_entities([sw], False)
+        if key == "guardmode" and not entry.capabilities.guard:
+            _LOGGER.debug("Guard mode not supported on this vehicle")
+            continue
+        switches.append(Switch(entry, key, config_entry.options))
+    async_add_platform_entities("switch", entry, switches, async_add_entities)
 
 
 class Switch(FordPassEntity, SwitchEntity):
@@ -35,29 +31,24 @@ class Switch(FordPassEntity, SwitchEntity):
         self._device_id = "fordpass_" + switch
         self.switch = switch
         self.coordinator = coordinator
+        self._status_keys = set(SWITCHES[switch]["keys"])
 
     async def async_turn_on(self, **kwargs):
         if self.switch == "ignition":
-            await self.coordinator.hass.async_add_executor_job(
-                self.coordinator.vehicle.start
-            )
+            result = await self.coordinator.commands.submit("start")
+            log_result("Remote start of", self.coordinator.vin, result)
             await self.coordinator.async_request_refresh()
         elif self.switch == "guardmode":
-            await self.coordinator.hass.async_add_executor_job(
-                self.coordinator.vehicle.enableGuard
-            )
+            await self.coordinator.commands.submit("enableGuard")
             await self.coordinator.async_request_refresh()
 
     async def async_turn_off(self, **kwargs):
         if self.switch == "ignition":
-            await self.coordinator.hass.async_add_executor_job(
-                self.coordinator.vehicle.stop
-            )
+            result = await self.coordinator.commands.submit("stop")
+            log_result("Remote stop of", self.coordinator.vin, result)
             await self.coordinator.async_request_refresh()
         elif self.switch == "guardmode":
-            await self.coordinator.hass.async_add_executor_job(
-                self.coordinator.vehicle.disableGuard
-            )
+            await self.coordinator.commands.submit("disableGuard")
             await self.coordinator.async_request_refresh()
 
     @property
@@ -74,16 +65,16 @@ class Switch(FordPassEntity, SwitchEntity):
             """Determine if the vehicle is started."""
             if (
                 self.coordinator.data is None
-                or self.coordinator.data["remoteStartStatus"] is None
+                or self.coordinator.data.remoteStartStatus is None
             ):
                 return None
-            return self.coordinator.data["remoteStartStatus"]["value"]
+            return self.coordinator.data.remoteStartStatus.value
         elif self.switch == "guardmode":
             # Need to find the correct response for enabled vs disabled so this may be spotty at the moment
-            guardstatus = self.coordinator.data["guardstatus"]
+            guardstatus = self.coordinator.data.guardstatus
 
             _LOGGER.debug(guardstatus)
-            if guardstatus["returnCode"] == 200:
+            if guardstatus.get("returnCode") == 200:
                 if "gmStatus" in guardstatus:
                     if guardstatus["session"]["gmStatus"] == "enable":
                         return True
@@ -0,0 +1,116 @@
+"""Benchmark of decoding recorded status payloads, per decoder and per refresh.
+
+Times the standard library and orjson (when installed) on every status and
+guard status body in tools/fixtures or in the given cassettes, along with the
+lastRefresh scan that lets an unchanged status skip decoding altogether, and
+building the VehicleSnapshot the coordinator stores when Home Assistant is
+installed.
+
+Run from the repository root in an environment with Home Assistant installed:
+
+    python tools/bench_decode.py --iterations 2000
+    python tools/bench_decode.py --cassette tools/fixtures/f150.cassette
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from custom_components.fordpass.cassette import Cassette  # noqa: E402
+from custom_components.fordpass.decoder import (  # noqa: E402
+    decoderName,
+    scanLastRefresh,
+    stdlibLoads,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from custom_components.fordpass.snapshot import VehicleSnapshot
+except ImportError:  # Home Assistant is not installed
+    VehicleSnapshot = None
+
+FIXTURES = os.path.join(ROOT, "tools", "fixtures")
+
+
+def fixture_bodies():
+    """Return the raw status and guard status bodies in tools/fixtures."""
+    bodies = []
+    for name in ("status.json", "guardstatus.json"):
+        with open(os.path.join(FIXTURES, name), "rb") as fixture:
+            bodies.append((name, fixture.read()))
+    return bodies
+
+
+def cassette_bodies(location):
+    """Return every recorded status and guard status body in a cassette."""
+    bodies = []
+    for interaction in Cassette.load(location).interactions:
+        path = interaction["path"]
+        if interaction["method"] == "GET" and path.endswith(("/status", "/session")):
+            name = f"{os.path.basename(location)}:{path.rsplit('/', 1)[-1]}"
+            bodies.append((name, json.dumps(interaction["body"]).encode()))
+    return bodies
+
+
+def cost(function, body, iterations):
+    """Return the mean seconds one call of function takes on body."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function(body)
+    return (time.perf_counter() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--cassette", action="append", default=[])
+    args = parser.parse_args()
+
+    bodies = []
+    for location in args.cassette:
+        bodies += cassette_bodies(location)
+    if not bodies:
+        bodies = fixture_bodies()
+
+    decoders = {"json": stdlibLoads}
+    if orjson is not None:
+        decoders["orjson"] = orjson.loads
+    stages = {**decoders, "scan": scanLastRefresh}
+    if VehicleSnapshot is not None:
+        for name, decode in decoders.items():
+            stages[f"{name}+snapshot"] = lambda body, decode=decode: VehicleSnapshot(
+                decode(body).get("vehiclestatus", {})
+            )
+
+    print(f"The integration decodes with {decoderName}")
+    print(f"{'payload':<28}{'bytes':>8}" + "".join(f"{n:>16}" for n in stages))
+    # A refresh decodes one status and one guard status body
+    costs = {"status": [], "guard": []}
+    for name, body in bodies:
+        kind = "status" if b"vehiclestatus" in body else "guard"
+        row = f"{name[:27]:<28}{len(body):>8}"
+        seconds = {stage: cost(f, body, args.iterations) for stage, f in stages.items()}
+        costs[kind].append(seconds)
+        for stage in stages:
+            row += f"{seconds[stage] * 1e6:>13.1f} us"
+        print(row)
+
+    row = f"{'per refresh':<28}{'':>8}"
+    for stage in stages:
+        total = sum(
+            sum(c[stage] for c in kind) / len(kind) for kind in costs.values() if kind
+        )
+        row += f"{total * 1e6:>13.1f} us"
+    print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""End-to-end benchmark of coordinator refreshes against the local API stand-in.
+
+For each fleet size this runs FordPassDataUpdateCoordinator refreshes for
+every vehicle, then reads every platform entity's properties the way a
+state write does. It reports refresh latency percentiles, API requests per
+refresh, executor thread occupancy, CPU time spent in entity properties
+and peak RSS, and writes the results as JSON.
+
+Accounts are built by async_get_account like the integration builds them,
+sharing one rate limiter and one set of circuit breakers, so large fleets
+are paced the way they are in Home Assistant.
+
+Run from the repository root in an environment with Home Assistant installed:
+
+    python tools/bench_refresh.py --vehicles 1 10 100 500 --output bench.json
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.fordpass import (  # noqa: E402
+    ACCOUNTS,
+    BREAKERS,
+    LIMITER,
+    FordPassDataUpdateCoordinator,
+    async_get_account,
+)
+from custom_components.fordpass.const import (  # noqa: E402
+    CONF_DISTANCE_UNIT,
+    CONF_PRESSURE_UNIT,
+    DOMAIN,
+    SENSORS,
+    SWITCHES,
+)
+from custom_components.fordpass.device_tracker import CarTracker  # noqa: E402
+from custom_components.fordpass.lock import Lock  # noqa: E402
+from custom_components.fordpass.sensor import CarSensor  # noqa: E402
+from custom_components.fordpass.switch import Switch  # noqa: E402
+from mock_api import MockFordPass, fake_vins  # noqa: E402
+
+OPTIONS = {CONF_DISTANCE_UNIT: "km", CONF_PRESSURE_UNIT: "kPa"}
+
+# Properties Home Assistant reads when it writes each kind of entity's state
+PROPERTIES = {
+    CarSensor: ("state", "unit_of_measurement", "device_state_attributes", "icon"),
+    Lock: ("is_locked", "icon"),
+    Switch: ("is_on", "icon"),
+    CarTracker: ("latitude", "longitude", "device_state_attributes"),
+}
+
+
+class OccupancyExecutor(concurrent.futures.ThreadPoolExecutor):
+    """Thread pool that adds up how long its threads spend running jobs."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.busy = 0.0
+        self.jobs = 0
+
+    def submit(self, fn, *args, **kwargs):
+        def timed():
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.busy += time.perf_counter() - started
+
+        self.jobs += 1
+        return super().submit(timed)
+
+
+def percentile(values, fraction):
+    """Return the value at the given fraction of the sorted values."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+async def create_hass(config_dir):
+    """Create a bare Home Assistant core across old and new constructor signatures."""
+    try:
+        hass = HomeAssistant(config_dir)
+    except TypeError:
+        hass = HomeAssistant()
+        hass.config.config_dir = config_dir
+    return hass
+
+
+def entities_for(coordinator):
+    """Build the full set of platform entities for one vehicle."""
+    entities = [CarSensor(coordinator, key, OPTIONS) for key in SENSORS]
+    entities += [Switch(coordinator, key, OPTIONS) for key in SWITCHES]
+    entities.append(Lock(coordinator))
+    entities.append(CarTracker(coordinator, "gps"))
+    return entities
+
+
+def evaluate(entities):
+    """Read every entity's state properties and return the CPU seconds spent."""
+    started = time.process_time()
+    for entity in entities:
+        for name in PROPERTIES[type(entity)]:
+            getattr(entity, name)
+    return time.process_time() - started
+
+
+async def run_fleet(hass, mock, vehicles, rounds, per_account):
+    """Benchmark one fleet size and return its results."""
+    executor = OccupancyExecutor()
+    hass.loop.set_default_executor(executor)
+
+    # Each fleet starts with fresh accounts, rate limiter and circuit breakers
+    data = hass.data.setdefault(DOMAIN, {})
+    for key in (ACCOUNTS, LIMITER, BREAKERS):
+        data.pop(key, None)
+    accounts = []
+    coordinators = []
+    vins = fake_vins(vehicles)
+    for start in range(0, vehicles, per_account):
+        account = async_get_account(
+            hass,
+            f"bench{start}@example.com",
+            "password",
+            "North America & Canada",
+            endpoints=mock.endpoints,
+        )
+        accounts.append(account)
+        for vin in vins[start : start + per_account]:
+            coordinators.append(FordPassDataUpdateCoordinator(hass, account, vin))
+
+    latencies = []
+    entity_cpu = 0.0
+    failures = 0
+    requests_before = sum(mock.requests.values())
+    wall_started = time.perf_counter()
+    entities = None
+
+    async def timed_refresh(coordinator):
+        started = time.perf_counter()
+        await coordinator.async_refresh()
+        latencies.append(time.perf_counter() - started)
+        return coordinator.last_update_success
+
+    try:
+        for _ in range(rounds):
+            results = await asyncio.gather(*map(timed_refresh, coordinators))
+            failures += results.count(False)
+            if entities is None:
+                entities = [e for c in coordinators for e in entities_for(c)]
+            entity_cpu += evaluate(entities)
+    finally:
+        for account in accounts:
+            account.close()
+
+    wall = time.perf_counter() - wall_started
+    refreshes = vehicles * rounds
+    executor.shutdown(wait=True)
+    return {
+        "vehicles": vehicles,
+        "rounds": rounds,
+        "refreshes": refreshes,
+        "failed_refreshes": failures,
+        "latency_p50_ms": percentile(latencies, 0.50) * 1000,
+        "latency_p95_ms": percentile(latencies, 0.95) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "requests_per_refresh": (sum(mock.requests.values()) - requests_before)
+        / refreshes,
+        "executor_jobs": executor.jobs,
+        "executor_occupancy": executor.busy / wall,
+        "entity_cpu_ms_per_refresh": entity_cpu * 1000 / refreshes,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "wall_s": wall,
+    }
+
+
+async def main(args):
+    mock = MockFordPass(
+        latency=args.latency,
+        jitter=args.jitter,
+        seed=args.seed,
+        report_rate=args.report_rate,
+    )
+    await mock.start()
+    results = []
+    with tempfile.TemporaryDirectory() as config_dir:
+        # Token files go where the integration writes them
+        os.makedirs(os.path.join(config_dir, "custom_components", "fordpass"))
+        hass = await create_hass(config_dir)
+        try:
+            for vehicles in args.vehicles:
+                result = await run_fleet(
+                    hass, mock, vehicles, args.rounds, args.vehicles_per_account
+                )
+                results.append(result)
+                print(
+                    f"{vehicles:>4} vehicles: "
+                    f"p50 {result['latency_p50_ms']:.1f} ms, "
+                    f"p95 {result['latency_p95_ms']:.1f} ms, "
+                    f"p99 {result['latency_p99_ms']:.1f} ms, "
+                    f"{result['requests_per_refresh']:.2f} req/refresh, "
+                    f"{result['entity_cpu_ms_per_refresh']:.3f} ms entity CPU/refresh"
+                )
+        finally:
+            await mock.stop()
+            await hass.async_stop(force=True)
+
+    report = {
+        "python": platform.python_version(),
+        "latency_s": args.latency,
+        "report_rate": args.report_rate,
+        "results": results,
+    }
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--vehicles", type=int, nargs="+", default=[1, 10, 100, 500]
+    )
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--vehicles-per-account", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--report-rate",
+        type=float,
+        default=1.0,
+        help="fraction of polls for which a car has reported something new",
+    )
+    parser.add_argument("--output", default="bench_refresh.json")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,119 @@
+"""Micro-benchmark of the CarSensor property reads behind one state write.
+
+Home Assistant reads state, unit_of_measurement and device_state_attributes
+every time it writes a sensor's state. This times those reads for every
+sensor, and the CarTracker reads, against the recorded payload in
+tools/fixtures or every status payload in a cassette.
+
+Run from the repository root in an environment with Home Assistant installed:
+
+    python tools/bench_sensor.py --iterations 20000
+    python tools/bench_sensor.py --cassette tools/fixtures/f150.cassette
+
+Check out the revision before a change and run it again to compare.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from custom_components.fordpass.cassette import Cassette  # noqa: E402
+from custom_components.fordpass.const import (  # noqa: E402
+    CONF_DISTANCE_UNIT,
+    CONF_PRESSURE_UNIT,
+    SENSORS,
+)
+from custom_components.fordpass.device_tracker import CarTracker  # noqa: E402
+from custom_components.fordpass.sensor import CarSensor  # noqa: E402
+
+try:
+    from custom_components.fordpass.snapshot import VehicleSnapshot
+except ImportError:  # Revisions that stored the raw payload in a DottedDict
+    from dotted.collection import DottedDict as VehicleSnapshot
+
+FIXTURE = os.path.join(ROOT, "tools", "fixtures", "status.json")
+
+
+def coordinator_for(payload):
+    """Return a stand-in coordinator holding the payload as the integration stores it."""
+    return types.SimpleNamespace(
+        vin="BENCH", data=VehicleSnapshot(payload["vehiclestatus"]), stale=False
+    )
+
+
+def cassette_payloads(location):
+    """Return every recorded status payload in a cassette."""
+    return [
+        interaction["body"]
+        for interaction in Cassette.load(location).interactions
+        if interaction["method"] == "GET"
+        and isinstance(interaction["body"], dict)
+        and "vehiclestatus" in interaction["body"]
+    ]
+
+
+def write_cost(sensor, iterations):
+    """Return the mean seconds spent on the property reads of one state write."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        sensor.state
+        sensor.unit_of_measurement
+        sensor.device_state_attributes
+    return (time.perf_counter() - started) / iterations
+
+
+def tracker_cost(tracker, iterations):
+    """Return the mean seconds spent on the property reads of one tracker write."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        tracker.latitude
+        tracker.longitude
+        tracker.device_state_attributes
+    return (time.perf_counter() - started) / iterations
+
+
+def bench(payload, options, iterations):
+    """Print the cost of every entity's state write for one payload."""
+    total = 0.0
+    for key in SENSORS:
+        sensor = CarSensor(coordinator_for(payload), key, options)
+        cost = write_cost(sensor, iterations)
+        total += cost
+        print(f"{key:<24}{cost * 1e6:>10.2f} us/write")
+    cost = tracker_cost(CarTracker(coordinator_for(payload), "gps"), iterations)
+    total += cost
+    print(f"{'tracker':<24}{cost * 1e6:>10.2f} us/write")
+    print(f"{'all entities':<24}{total * 1e6:>10.2f} us/refresh")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--distance-unit", default="km", choices=["km", "mi"])
+    parser.add_argument("--pressure-unit", default="kPa", choices=["kPa", "PSI"])
+    parser.add_argument("--cassette", help="benchmark every status payload in a cassette")
+    args = parser.parse_args()
+
+    if args.cassette:
+        payloads = cassette_payloads(args.cassette)
+    else:
+        with open(FIXTURE) as fixture:
+            payloads = [json.load(fixture)]
+    options = {
+        CONF_DISTANCE_UNIT: args.distance_unit,
+        CONF_PRESSURE_UNIT: args.pressure_unit,
+    }
+
+    for index, payload in enumerate(payloads):
+        if len(payloads) > 1:
+            print(f"payload {index + 1}/{len(payloads)}")
+        bench(payload, options, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
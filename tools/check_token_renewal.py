@@ -0,0 +1,62 @@
+"""Regression check that a token renews in the background after its budget ran out.
+
+The integration gets its token inside the request budget of a status or guard
+fetch. The background renewal scheduled from there fires long after that
+budget has run out and must still send its refresh request. This logs in
+through a stub transport under a short budget, waits for the renewal and
+exits non-zero if it was not sent or did not store a new token.
+
+Run from the repository root:
+
+    python tools/check_token_renewal.py
+"""
+import asyncio
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from custom_components.fordpass.fordpass_async import Account  # noqa: E402
+from custom_components.fordpass.resilience import requestBudget  # noqa: E402
+
+# Tokens expire this soon, with the default margin they renew after half of it
+EXPIRES_IN = 2
+BUDGET = 0.5
+
+
+class StubTransport:
+    """Answers the login and refresh requests, counting refreshes."""
+
+    def __init__(self):
+        self.refreshes = 0
+
+    async def __call__(self, method, url, headers, data, params):
+        if url.endswith("/refresh"):
+            self.refreshes += 1
+        token = f"token{self.refreshes}"
+        body = {"access_token": token, "refresh_token": token, "expires_in": EXPIRES_IN}
+        return 200, json.dumps(body).encode()
+
+
+async def main():
+    account = Account(None, "check@example.com", "password", "North America & Canada")
+    transport = account.transport = StubTransport()
+    try:
+        with requestBudget(BUDGET):
+            await account.acquireToken()
+        first = account.token
+        await asyncio.sleep(EXPIRES_IN / 2 + BUDGET + 0.5)
+    finally:
+        account.close()
+
+    if transport.refreshes != 1 or account.token == first:
+        print(f"FAIL: {transport.refreshes} refreshes sent, token {account.token}")
+        return 1
+    print("OK: token renewed in the background after its budget ran out")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
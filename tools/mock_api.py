@@ -0,0 +1,285 @@
+"""Local stand-in for the FordPass API, for offline testing and benchmarking.
+
+Serves the SSO token endpoint, the token exchange and refresh, vehicle
+status, remote commands with completion polling and guard mode for any
+number of VINs. Latency and error responses can be injected
+deterministically.
+
+Run it standalone and point a client at the printed endpoints:
+
+    python tools/mock_api.py --port 8099 --latency 0.05 --fail 429=0.02
+
+or start it in-process with MockFordPass and pass mock.endpoints as the
+endpoints argument of Vehicle or Account.
+"""
+import argparse
+import asyncio
+import copy
+import datetime
+import json
+import os
+import random
+import time
+import uuid
+
+from aiohttp import web
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Remote command paths, matched as one route variable
+COMMANDS = "{command:doors/lock|engine/start}"
+
+# Injected faults only hit vehicle endpoints, 402 is reported in the body of a 200
+FAULT_PREFIXES = ("/api/", "/guard/")
+BODY_FAULTS = (402,)
+
+
+def fake_vins(count):
+    """Return count distinct 17 character VINs."""
+    return [f"1FMCU9J9{index:09d}" for index in range(count)]
+
+
+class MockFordPass:
+    """In-process FordPass API stand-in built on aiohttp.web."""
+
+    def __init__(
+        self,
+        latency=0.0,
+        jitter=0.0,
+        faults=None,
+        pending_polls=1,
+        token_lifetime=3600,
+        seed=0,
+        report_rate=1.0,
+    ):
+        """Configure latency, fault rates per status code and command polling.
+
+        report_rate is the fraction of status requests for which the car has
+        reported since the last one, the rest repeat the previous lastRefresh.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.faults = faults or {}
+        self.pending_polls = pending_polls
+        self.token_lifetime = token_lifetime
+        self.report_rate = report_rate
+        self.random = random.Random(seed)
+        self.requests = {}
+        self.endpoints = None
+        self._tokens = {}
+        self._refresh_tokens = set()
+        self._commands = {}
+        self._reports = {}
+        self._runner = None
+        with open(os.path.join(FIXTURES, "status.json")) as fixture:
+            self._status = json.load(fixture)
+        with open(os.path.join(FIXTURES, "guardstatus.json")) as fixture:
+            self._guard = json.load(fixture)
+
+        self.app = web.Application(middlewares=[self._middleware])
+        self.app.add_routes(
+            [
+                web.post("/sso/token", self._sso_token),
+                web.put("/oauth2/v1/token", self._token),
+                web.put("/oauth2/v1/refresh", self._refresh),
+                web.get("/api/vehicles/v4/{vin}/status", self._status_v4),
+                web.put("/api/vehicles/v2/{vin}/status", self._request_update),
+                web.put(f"/api/vehicles/v2/{{vin}}/{COMMANDS}", self._command),
+                web.delete(f"/api/vehicles/v2/{{vin}}/{COMMANDS}", self._command),
+                web.get(f"/api/vehicles/v2/{{vin}}/{COMMANDS}/{{id}}", self._poll),
+                web.get("/guard/guardmode/v1/{vin}/session", self._guard_session),
+                web.put("/guard/guardmode/v1/{vin}/session", self._guard_session),
+                web.delete("/guard/guardmode/v1/{vin}/session", self._guard_session),
+            ]
+        )
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving and return the endpoints to hand to a client."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        base = f"http://{host}:{port}"
+        self.endpoints = {
+            "sso": f"{base}/sso/token",
+            "auth": f"{base}/oauth2/v1",
+            "api": f"{base}/api",
+            "guard": f"{base}/guard",
+        }
+        return self.endpoints
+
+    async def stop(self):
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        """Count the request, apply latency and inject configured faults."""
+        route = request.match_info.route.resource
+        name = route.canonical if route is not None else request.path
+        key = f"{request.method} {name}"
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if not request.path.startswith(FAULT_PREFIXES):
+            return await handler(request)
+        for status, rate in self.faults.items():
+            if status == 552 or self.random.random() >= rate:
+                continue
+            if status in BODY_FAULTS:
+                return web.json_response({"status": status})
+            return web.json_response({"status": status}, status=status)
+        return await handler(request)
+
+    def _issue(self):
+        """Issue a new access and refresh token pair."""
+        access = uuid.UUID(int=self.random.getrandbits(128)).hex
+        refresh = uuid.UUID(int=self.random.getrandbits(128)).hex
+        self._tokens[access] = time.time() + self.token_lifetime
+        self._refresh_tokens.add(refresh)
+        return web.json_response(
+            {
+                "access_token": access,
+                "refresh_token": refresh,
+                "expires_in": self.token_lifetime,
+            }
+        )
+
+    def _authorized(self, request):
+        """Return True if the request carries a live access token."""
+        expires = self._tokens.get(request.headers.get("auth-token"))
+        return expires is not None and expires > time.time()
+
+    async def _sso_token(self, request):
+        form = await request.post()
+        if not form.get("username") or not form.get("password"):
+            return web.json_response({"error": "invalid_grant"}, status=400)
+        return web.json_response({"access_token": uuid.uuid4().hex})
+
+    async def _token(self, request):
+        body = json.loads(await request.text())
+        if not body.get("code"):
+            return web.json_response({"status": 401}, status=401)
+        return self._issue()
+
+    async def _refresh(self, request):
+        body = json.loads(await request.text())
+        if body.get("refresh_token") not in self._refresh_tokens:
+            return web.json_response({"status": 401}, status=401)
+        self._refresh_tokens.discard(body["refresh_token"])
+        return self._issue()
+
+    async def _status_v4(self, request):
+        if not self._authorized(request):
+            return web.json_response({"status": 401}, status=401)
+        vin = request.match_info["vin"]
+        reports = self._reports.get(vin, 0)
+        if not reports or self.random.random() < self.report_rate:
+            reports += 1
+            self._reports[vin] = reports
+        payload = copy.deepcopy(self._status)
+        payload["vehiclestatus"]["vin"] = vin
+        payload["vehiclestatus"]["lastRefresh"] = _report_time(reports)
+        return web.json_response(payload)
+
+    async def _request_update(self, request):
+        if not self._authorized(request):
+            return web.json_response({"status": 401}, status=401)
+        return web.json_response({"status": 200})
+
+    async def _command(self, request):
+        if not self._authorized(request):
+            return web.json_response({"status": 401}, status=401)
+        command_id = uuid.UUID(int=self.random.getrandbits(128)).hex
+        pending = self.pending_polls
+        if self.random.random() < self.faults.get(552, 0):
+            # A stuck command that never leaves the pending state
+            pending = None
+        self._commands[command_id] = pending
+        return web.json_response({"status": 200, "commandId": command_id})
+
+    async def _poll(self, request):
+        if not self._authorized(request):
+            return web.json_response({"status": 401}, status=401)
+        command_id = request.match_info["id"]
+        if command_id not in self._commands:
+            return web.json_response({"status": 404})
+        pending = self._commands[command_id]
+        if pending is None or pending > 0:
+            if pending is not None:
+                self._commands[command_id] = pending - 1
+            return web.json_response({"status": 552})
+        return web.json_response({"status": 200})
+
+    async def _guard_session(self, request):
+        if not self._authorized(request):
+            return web.json_response({"status": 401}, status=401)
+        return web.json_response(self._guard)
+
+
+def _report_time(reports):
+    """Return the lastRefresh of a car's numbered report."""
+    reported = datetime.datetime(2021, 1, 1) + datetime.timedelta(minutes=reports)
+    return reported.strftime("%m-%d-%Y %H:%M:%S")
+
+
+def parse_faults(values):
+    """Parse CODE=RATE pairs into a fault table."""
+    faults = {}
+    for value in values:
+        code, rate = value.split("=")
+        faults[int(code)] = float(rate)
+    return faults
+
+
+async def serve(args):
+    mock = MockFordPass(
+        latency=args.latency,
+        jitter=args.jitter,
+        faults=parse_faults(args.fail),
+        pending_polls=args.pending_polls,
+        token_lifetime=args.token_lifetime,
+        seed=args.seed,
+        report_rate=args.report_rate,
+    )
+    endpoints = await mock.start(args.host, args.port)
+    print(json.dumps(endpoints, indent=2))
+    print("Example VINs:", ", ".join(fake_vins(3)))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await mock.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument(
+        "--fail",
+        action="append",
+        default=[],
+        metavar="CODE=RATE",
+        help="inject 401, 402, 429, 500, 503 or a stuck 552 command at this rate",
+    )
+    parser.add_argument("--pending-polls", type=int, default=1)
+    parser.add_argument("--token-lifetime", type=int, default=3600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report-rate", type=float, default=1.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Record a sanitized cassette of real FordPass status traffic.
+
+Polls status and guard status for each VIN through the async client with
+recording on, then writes the scrubbed exchanges to a gzipped cassette that
+bench_sensor.py and ReplayTransport can serve back without live calls.
+
+Run from the repository root with real credentials:
+
+    python tools/record_cassette.py --username me@example.com --password ... \\
+        --vin 1FT... --vin 5YJ... --polls 3 --output tools/fixtures/f150.cassette
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from custom_components.fordpass.cassette import record  # noqa: E402
+from custom_components.fordpass.fordpass_async import Account  # noqa: E402
+
+
+async def main(args):
+    async with aiohttp.ClientSession() as session:
+        account = Account(session, args.username, args.password, args.region)
+        cassette = record(account)
+        try:
+            for poll in range(args.polls):
+                if poll:
+                    await asyncio.sleep(args.interval)
+                for vin in args.vin:
+                    vehicle = account.vehicle(vin)
+                    await vehicle.status()
+                    await vehicle.guardStatus()
+        finally:
+            account.close()
+    cassette.save(args.output)
+    print(f"Wrote {len(cassette.interactions)} interactions to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--region", default="North America & Canada")
+    parser.add_argument("--vin", action="append", required=True)
+    parser.add_argument("--polls", type=int, default=1)
+    parser.add_argument("--interval", type=float, default=60)
+    parser.add_argument("--output", default="fordpass.cassette")
+    asyncio.run(main(parser.parse_args()))